@@ -0,0 +1,253 @@
+# -------------------------------------------------------------------------------
+# Name:        EurasiaUtilsCLI.py
+# Purpose:     run EurasiaUtilsGUI operations without a GUI from a job file
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+# Description: the job file is JSON consisting of settings shared by all jobs and a list of jobs e.g.
+#              {
+#                "settings": {"country_codes": "E:\\Dagmar\\Country_codes", "eobs_dir": "E:\\EObs_v17\\Monthly"},
+#                "jobs": [
+#                  {"operation": "codes_table", "run_fname": "E:\\Dagmar\\DayCent\\run_files\\run_file.csv"},
+#                  {"operation": "convert_excel", "excel_fname": "E:\\Dagmar\\Datasets\\Europe_Tg.xlsx"}
+#                ]
+#              }
+#              job keys override settings, see OPERATIONS for the keys used by each operation
+#              operations which write NetCDF files read and write in windows unless the window key is false
+#              stage timings of operations on the form are logged at INFO level, a job with the stacks_fname key
+#              also writes a sampled profile of folded stacks to that file for rendering as a flame graph
+# -------------------------------------------------------------------------------
+# !/usr/bin/env python
+
+__prog__ = 'EurasiaUtilsCLI.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import sys
+import argparse
+import logging
+from json import load as json_load
+from time import time
+from concurrent.futures import ProcessPoolExecutor
+
+APPLIC_STR = 'eurasia_utils'
+ERROR_STR = '*** Error *** '
+
+# operation name: (module, function, description)
+# ===============================================
+OPERATIONS = {
+    'codes_table': ('eurasia_funcs', '_create_codes_table',
+                                'country names and codes from run_fname to country_codes, optional: run_cache'),
+    'shape_files': ('eurasia_funcs', '_generate_country_shape_files',
+                                    'unpack country_zips to shp_dir using country_codes, optional: max_workers'),
+    'convert_excel': ('excel_to_netcdf_funcs', 'convert_excel_file',
+                                            'filter excel_fname to CSV, optional: overwrite, stream, batch_size'),
+    'convert_csv': ('excel_to_netcdf_funcs', 'convert_csv_file',
+                            'CSV saved from excel_fname to NetCDF using eobs_dir, optional: window, profile, resume'),
+    'excel_to_netcdf': ('excel_to_netcdf_funcs', 'convert_excel_to_netcdf',
+                            'excel_fname to NetCDF using eobs_dir, optional: csv, window, profile, resume'),
+    'batch_convert': ('excel_to_netcdf_funcs', 'batch_convert',
+                            'batch_src to NetCDF using eobs_dir, optional: max_workers, window, profile, resume'),
+    'compare_mngmt': ('tree_compare_funcs', 'compare_trees',
+                            'management.txt files in sims_dir and mirror_dir, optional: max_workers, report, index'),
+    'ingest_summaries': ('summary_ingest', 'ingest_study',
+                            'SUMMARY.OUT files in sims_dir to NetCDF in outdir using summary_varnames, fut_clim_scen, '
+                            'fut_start_year, fut_end_year and land_use, optional: max_workers, profile, resume'),
+    'test_hwsd_v1': ('eurasia_funcs', '_test_hwsd_v1_access',
+                                            'HWSD V1 single point retrieval from hwsd_dir, optional: mmap'),
+    'point_soils': ('hwsd_points', 'run_file_soils',
+                            'HWSD V1 soils of sites in run_fname from hwsd_dir, optional: out_fname, max_workers, '
+                                                                                                    'run_cache'),
+    'test_hwsd_v2': ('eurasia_funcs', '_test_hwsd_v2_access', 'HWSD V2 single SMU retrieval from access_db_fn'),
+    'export_hwsd2': ('hwsd2_query', 'export_to_sqlite', 'HWSD V2 tables from access_db_fn to indexed sqlite_fname')
+}
+
+class _TextLabel(object):
+    """
+    stands in for the QLabel widgets from which file names are read
+    """
+    def __init__(self, text = ''):
+        self._text = text
+
+    def text(self):
+        return self._text
+
+    def setText(self, text):
+        self._text = text
+
+def _headless_form(params):
+    """
+    create an object with the attributes and widgets which the operations read from the GUI form
+    """
+    form = type('form', (), {})()
+    form.settings = dict(params)
+    for key in params:
+        setattr(form, key, params[key])
+
+    form.w_lbl05 = _TextLabel(params.get('excel_fname', ''))
+    form.w_lbl07 = _TextLabel(params.get('run_fname', ''))
+    form.lggr = logging.getLogger(APPLIC_STR)
+    form.lgr = form.lggr
+
+    return form
+
+def _call_operation(operation, params):
+    """
+    import the module for the operation and call its function with arguments taken from params
+    """
+    from importlib import import_module
+
+    module_name, func_name, dummy = OPERATIONS[operation]
+    func = getattr(import_module(module_name), func_name)
+    form = _headless_form(params)
+
+    if operation == 'convert_excel':
+        kwargs = {'overwrite_flag': params.get('overwrite', True), 'stream_flag': params.get('stream', False)}
+        if 'batch_size' in params:
+            kwargs['batch_size'] = params['batch_size']
+        return func(form, **kwargs)
+
+    if operation == 'convert_csv':
+        return func(form, window_flag = params.get('window', True), profile = params.get('profile'),
+                                                                            resume_flag = params.get('resume', False))
+
+    if operation == 'excel_to_netcdf':
+        return func(form, csv_flag = params.get('csv', False), window_flag = params.get('window', True),
+                                        profile = params.get('profile'), resume_flag = params.get('resume', False))
+    if operation == 'batch_convert':
+        return func(params['batch_src'], params['eobs_dir'], max_workers = params.get('max_workers'),
+                                        window_flag = params.get('window', True), profile = params.get('profile'),
+                                                                            resume_flag = params.get('resume', False))
+    if operation == 'shape_files':
+        return func(form, max_workers = params.get('max_workers'))
+
+    if operation == 'compare_mngmt':
+        return func(params['sims_dir'], params['mirror_dir'], max_workers = params.get('max_workers', 16),
+                                    report_fname = params.get('report'), index_flag = params.get('index', False))
+
+    if operation == 'ingest_summaries':
+        return func(form, params['summary_varnames'], max_workers = params.get('max_workers'),
+                                        profile = params.get('profile'), resume_flag = params.get('resume', False))
+    if operation == 'test_hwsd_v1':
+        return func(form.lggr, params['hwsd_dir'], mmap_flag = params.get('mmap', False))
+
+    if operation == 'point_soils':
+        return func(form.lggr, params['hwsd_dir'], params['run_fname'], out_fname = params.get('out_fname'),
+                                max_workers = params.get('max_workers'), cache_flag = params.get('run_cache', False))
+    if operation == 'test_hwsd_v2':
+        return func(params['access_db_fn'])
+
+    if operation == 'export_hwsd2':
+        return func(params['access_db_fn'], params['sqlite_fname'], overwrite_flag = params.get('overwrite', False))
+
+    return func(form)
+
+def _job_status(result):
+    """
+    return status of an operation from its result - None and the error codes 1 and -1 mean the operation failed,
+    as do failed conversions of a batch, zip files which could not be unpacked and rejected summary files
+    """
+    if result is None or (type(result) is int and result in (1, -1)):
+        return 'failed - operation returned {}'.format(result)
+
+    nfailed = 0
+    if isinstance(result, list):
+        nfailed = len([job for job in result if job['status'] != 'OK'])
+    elif isinstance(result, dict):
+        nfailed = result.get('nfailed', 0) + result.get('nrejected', 0)
+    if nfailed > 0:
+        return 'failed - {} items could not be processed'.format(nfailed)
+
+    return 'OK'
+
+def _run_job(job_num, job, settings):
+    """
+    run a single job - job keys override settings
+    """
+    params = dict(settings)
+    params.update(job)
+    operation = params.pop('operation', None)
+
+    start_time = time()
+    try:
+        status = _job_status(_call_operation(operation, params))
+    except Exception as err:
+        status = 'failed - {}: {}'.format(type(err).__name__, err)
+
+    return {'job_num': job_num, 'operation': operation, 'status': status, 'elapsed': time() - start_time}
+
+def read_job_file(job_fname):
+    """
+    return settings and list of jobs from job file, None if the job file is invalid
+    """
+    try:
+        with open(job_fname, 'r') as fjob:
+            job_file = json_load(fjob)
+    except (OSError, IOError, ValueError) as err:
+        print(ERROR_STR + 'could not read job file {}: {}'.format(job_fname, err))
+        return None, None
+
+    settings = job_file.get('settings', {})
+    jobs = job_file.get('jobs', [])
+    for job_num, job in enumerate(jobs):
+        if job.get('operation') not in OPERATIONS:
+            print(ERROR_STR + 'job {} operation {} not recognised - must be one of {}'
+                                                        .format(job_num, job.get('operation'), list(OPERATIONS)))
+            return None, None
+
+    return settings, jobs
+
+def _init_worker(log_level):
+    """
+    configure logging of a worker process as logging of the main process is not inherited by spawned processes
+    """
+    logging.basicConfig(level = log_level)
+
+def run_jobs(settings, jobs, max_workers = 1):
+    """
+    run jobs in order or, if max_workers is more than one, concurrently in a pool of processes
+    """
+    start_time = time()
+    if max_workers is None or max_workers > 1:
+        log_level = logging.getLogger().getEffectiveLevel()
+        with ProcessPoolExecutor(max_workers = max_workers, initializer = _init_worker,
+                                                                            initargs = (log_level,)) as executor:
+            futures = [executor.submit(_run_job, job_num, job, settings) for job_num, job in enumerate(jobs)]
+            results = [future.result() for future in futures]
+    else:
+        results = [_run_job(job_num, job, settings) for job_num, job in enumerate(jobs)]
+
+    print('\nCompleted {} jobs in {:.1f} seconds:'.format(len(results), time() - start_time))
+    for result in results:
+        print('\t{:3d}\t{:8.1f}s\t{:16}\t{}'.format(result['job_num'], result['elapsed'], result['operation'],
+                                                                                                result['status']))
+    return results
+
+def main():
+    """
+    C
+    """
+    parser = argparse.ArgumentParser(description = 'Run EurasiaUtils operations without a GUI')
+    parser.add_argument('job_fname', nargs = '?', help = 'JSON job file listing operations and their inputs')
+    parser.add_argument('--workers', type = int, default = 1,
+                                                    help = 'number of jobs to run concurrently, default 1')
+    parser.add_argument('--list', action = 'store_true', help = 'list operations and exit')
+    args = parser.parse_args()
+
+    if args.list or args.job_fname is None:
+        for operation in OPERATIONS:
+            print('{:16}\t{}'.format(operation, OPERATIONS[operation][2]))
+        return 0
+
+    logging.basicConfig(level = logging.INFO)
+    settings, jobs = read_job_file(args.job_fname)
+    if jobs is None:
+        return 1
+
+    results = run_jobs(settings, jobs, args.workers)
+    nfailed = len([result for result in results if result['status'] != 'OK'])
+
+    return int(nfailed > 0)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,22 +12,56 @@ __version__ = '0.0.1'
 __author__ = 's03mm5'
 
 import sys
+from time import perf_counter
+from importlib import import_module
 
+# heavy modules used by individual buttons are imported on first use by _lazy_import
+# import times are recorded so that startup cost can be reported with the --startup-report option
+# ================================================================================================
+start_time = perf_counter()
+import_times = {}
+
+_time_strt = perf_counter()
+from PyQt5.QtCore import QTimer
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtWidgets import (QLabel, QWidget, QApplication, QHBoxLayout, QVBoxLayout, QGridLayout, QPushButton,
                              QFileDialog)
-from pyodbc import connect, drivers
+import_times['PyQt5'] = perf_counter() - _time_strt
+
 from os.path import join, isdir, isfile, split, splitext, exists, basename, splitdrive
 from os import getcwd, walk, chdir
-from filecmp import cmp as cmpr_two_files
 
-from hwsd_bil import HWSD_bil
-from eurasia_funcs import _generate_country_shape_files, _create_codes_table
-from excel_to_netcdf_funcs import convert_excel_file, convert_csv_file
+_time_strt = perf_counter()
 from initialise_funcs import initiation, write_config_file
+import_times['initialise_funcs'] = perf_counter() - _time_strt
 
 ERROR_STR = '*** Error *** '
 
+def _lazy_import(module_name):
+    """
+    import module on first use and record the time taken
+    """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    time_strt = perf_counter()
+    module = import_module(module_name)
+    import_times[module_name + ' (on first use)'] = perf_counter() - time_strt
+
+    return module
+
+def report_startup_times():
+    """
+    print import cost per module and time taken to paint the form
+    """
+    total_time = perf_counter() - start_time
+    print('\nStartup time report - form painted after {:.3f} seconds'.format(total_time))
+    for module_name, elapsed in sorted(import_times.items(), key=lambda item: item[1], reverse=True):
+        print('\t{:8.3f}s {:5.1f}%\t{}'.format(elapsed, 100*elapsed/total_time, module_name))
+    print('for a finer breakdown run with: python -X importtime ' + __prog__)
+
+    return
+
 class Form(QWidget):
     """
     X
@@ -136,6 +170,12 @@ class Form(QWidget):
         grid.addWidget(w_cnvrt_csv, irow, 0)
         w_cnvrt_csv.clicked.connect(self.convertCsvClicked)
 
+        w_excel_nc = QPushButton("Excel to NetCDF")
+        helpText = 'Convert Padraig Excel file to NetCDF4 in a single pass without the intermediate CSV file'
+        w_excel_nc.setToolTip(helpText)
+        grid.addWidget(w_excel_nc, irow, 1)
+        w_excel_nc.clicked.connect(self.excelToNetcdfClicked)
+
         # =======
         irow += 1
         w_hwsdv1 = QPushButton("Test V1 Access")
@@ -181,117 +221,53 @@ class Form(QWidget):
 
     def testHwsdV1Clicked(self):
         """
-
+        C
         """
-        lat, lon = (28.1, 74.23)
-        hwsd = HWSD_bil(self.lggr, self.settings['hwsd_dir'])
-        nvals_read = hwsd.read_bbox_mu_globals([lon, lat], snglPntFlag=True)
-        mu_globals = hwsd.get_mu_globals_dict()
-        if mu_globals is None:
-            print('No soil records for this area\n')
-            return
-
-        # create and instantiate a new class NB this stanza enables single site
-        # ==================================
-        hwsd_mu_globals = type('test', (), {})()
-        hwsd_mu_globals.soil_recs = hwsd.get_soil_recs(mu_globals)
-        if len(mu_globals) == 0:
-            print('No soil data for this area\n')
-            return
-
-        mu_globals_props = {next(iter(mu_globals)): 1.0}
-
-        mess = 'Retrieved {} values  of HWSD grid consisting of {} rows and {} columns: ' \
-               '\n\tnumber of unique mu_globals: {}'.format(nvals_read, hwsd.nlats, hwsd.nlons, len(mu_globals))
-        print(mess)
-
-        return
+        with _lazy_import('stage_timer').form_timer(self, '_test_hwsd_v1_access') as timer, timer.stage('read'):
+            _lazy_import('eurasia_funcs')._test_hwsd_v1_access(self.lggr, self.settings['hwsd_dir'])
 
     def cmprMngmtClicked(self):
         """
-
+        C
         """
-        access_db_fn = 'E:\\Apps\\test_db\\Database1.accdb'
-        sims_dir = 'G:\\GlblEcssOutputs\\EcosseSims\\Africa_Wheat_Africa_Wheat08A1B'
-
-        MAX_CMPRSNS = 100000000
-        ic = 0
-        n_oks = 0
-        for directory, subdirs_raw, files in walk(sims_dir):
-            fn_g = join(directory, 'management.txt')
-            if isfile(fn_g):
-                drv, file_name = splitdrive(fn_g)
-            else:
-                print(fn_g + ' does not exist')
-                continue
-
-            fn_z = join('Z:', file_name)
-            if cmpr_two_files(fn_g, fn_z):
-                n_oks + 1
-                if ic == 100 * (int(ic / 100)):
-                    print('OK: ' + directory)
-            else:
-                print('differ: ' + '\n\t' + fn_g + '\n\t' + fn_z)
-
-            if ic > MAX_CMPRSNS:
-                # print(directory)
-                break
-
-            ic += 1
-
-        print('OK: ' + directory)
+        for key in ('sims_dir', 'mirror_dir'):
+            if key not in self.settings or not isdir(self.settings[key]):
+                print(ERROR_STR + 'setting {} must be an existing directory to compare management files'.format(key))
+                return
+
+        report_fname = join(self.settings['results_dir'], 'management_comparison.csv')
+        try:
+            with _lazy_import('stage_timer').form_timer(self, 'compare_trees') as timer, timer.stage('validate'):
+                _lazy_import('tree_compare_funcs').compare_trees(self.settings['sims_dir'],
+                                                        self.settings['mirror_dir'], report_fname = report_fname)
+        except OSError as err:
+            print(ERROR_STR + 'could not compare management files: {}'.format(err))
 
     def testAccessClicked(self):
         """
-
+        C
         """
-        ms_drvr = 'Microsoft Access Driver(*.mdb, *.accdb)'
-        access_db_fn = 'E:\\Apps\\test_db\\Database1.accdb'
         access_db_fn = 'E:\\HWSD_V2\\mdb\\HWSD2.mdb'
-        lat, lon = (28.1, 74.23)
-
-        ms_srch_str = 'Microsoft Access Driver'
-        drvr_nms = [drvr_nm for drvr_nm in drivers() if drvr_nm.startswith(ms_srch_str)]
-        if len(drvr_nms) == 0:
-            print(ERROR_STR + 'could not find ' + ms_srch_str + ' among ODBC drivers')
-            return
-        ms_drvr = drvr_nms[0]
-
-        conn = connect(Driver=ms_drvr, DBQ=access_db_fn)
-        cursor = conn.cursor()
-
-        for table_info in cursor.tables(tableType='TABLE'):
-            print(table_info.table_name)
-
-        # retcode = cursor.execute('select * from D_ROOTS')
-
-        for row in cursor.columns(table='HWSD2_LAYERS'):
-            print(row.column_name)
-
-        VARS = ' SEQUENCE, SHARE, LAYER, SAND, SILT, CLAY, BULK, REF_BULK, ORG_CARBON, PH_WATER '
-        cmd = 'select ' + VARS + ' from HWSD2_LAYERS where HWSD2_SMU_ID = 9612'
-        retcode = cursor.execute(cmd)
-
-        recs = [rec for rec in cursor.fetchall()]
-        '''
-        for rec in recs:
-            print(rec)
-        '''
-        cursor.close()
-
-        return
+        with _lazy_import('stage_timer').form_timer(self, '_test_hwsd_v2_access') as timer, timer.stage('read'):
+            _lazy_import('eurasia_funcs')._test_hwsd_v2_access(access_db_fn)
 
     def convertExcelClicked(self):
         """
         C
         """
-        convert_excel_file(self)
+        _lazy_import('excel_to_netcdf_funcs').convert_excel_file(self)
+
+    def excelToNetcdfClicked(self):
+        """
+        C
+        """
+        _lazy_import('excel_to_netcdf_funcs').convert_excel_to_netcdf(self)
 
     def convertCsvClicked(self):
         """
         C
         """
-        convert_csv_file(self)
+        _lazy_import('excel_to_netcdf_funcs').convert_csv_file(self)
 
     def fetchExcelFile(self):
         """
@@ -323,20 +299,22 @@ class Form(QWidget):
         """
         C
         """
-        _create_codes_table(self)
+        _lazy_import('eurasia_funcs')._create_codes_table(self)
 
     def createFilesClicked(self):
         """
         C
         """
 
-        _generate_country_shape_files(self)
+        _lazy_import('eurasia_funcs')._generate_country_shape_files(self)
 
     def exitClicked(self):
         """
         write last GUI selections and close logger
         """
         write_config_file(self)
+        if '--startup-report' in sys.argv:
+            report_startup_times()
 
         try:
             self.lggr.handlers[0].close()  # close logging
@@ -352,6 +330,8 @@ def main():
     form = Form()  # instantiate form
     # display the GUI and start the event loop if we're not running batch mode
     form.show()  # paint form
+    if '--startup-report' in sys.argv:
+        QTimer.singleShot(0, report_startup_times)     # report once the event loop has painted the form
     sys.exit(app.exec_())  # start event loop
 
 
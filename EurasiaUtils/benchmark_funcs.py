@@ -0,0 +1,506 @@
+# -------------------------------------------------------------------------------
+# Name:        benchmark_funcs.py
+# Purpose:     time the main operations against synthetic inputs and record results as JSON
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+# Description: inputs are generated once in work_dir at one of the scales in BENCH_SCALES, each benchmark is then
+#              run in a freshly spawned process so that its peak resident memory is its own
+#              e.g. python benchmark_funcs.py E:\temp\bench --scale medium --out bench_1.json --compare bench_0.json
+# -------------------------------------------------------------------------------
+# !/usr/bin/env python
+
+__prog__ = 'benchmark_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+import sys
+import gzip
+import shutil
+import random
+import zipfile
+import argparse
+import platform
+import multiprocessing
+from queue import Empty
+from datetime import datetime
+from time import perf_counter, strftime
+from json import load as json_load, dump as json_dump
+
+ERROR_STR = '*** Error *** '
+MB = 1024*1024
+BENCH_METRIC = 'tg'
+BENCH_STUDY = 'Bench_Study'
+SUMMARY_VARNAMES = {'soc': 'SOC', 'co2': 'CO2', 'ch4': 'CH4', 'n2o': 'N2O'}
+result_poll_secs = 5.0      # interval at which a benchmark process is checked while waiting for its result
+
+# eobs: grid of nlats x nlons cells of 0.25 degrees; sites: nsites x nsites cells of seasonal records for nyears
+# run_recs: records of run file; zips: countries, files per zip and bytes per file; modis: gz files and lines;
+# spec: degrees square and years of the study NetCDF file
+# ==============================================================================================================
+BENCH_SCALES = {
+    'small': {'eobs': (40, 50), 'sites': 8, 'xl_sites': 4, 'nyears': 5, 'run_recs': 20000, 'zips': (10, 3, 64*1024),
+              'modis': (4, 500), 'spec': (0.5, 10)},
+    'medium': {'eobs': (100, 120), 'sites': 20, 'xl_sites': 10, 'nyears': 10, 'run_recs': 400000,
+               'zips': (50, 3, 256*1024), 'modis': (16, 2000), 'spec': (2.0, 50)},
+    'large': {'eobs': (200, 240), 'sites': 40, 'xl_sites': 20, 'nyears': 19, 'run_recs': 4000000,
+              'zips': (200, 3, 1024*1024), 'modis': (64, 5000), 'spec': (4.0, 95)}
+}
+BENCH_NAMES = ['create_netcdf_file', 'create_netcdf_vector', 'create_netcdf_row', 'convert_csv_file',
+               'convert_excel_file', 'convert_excel_stream', 'create_codes_table', 'create_codes_table_cached',
+               'generate_country_shape_files', 'reformat_modis_files', 'create_NCfile']
+
+SEASONS = [(1, [12, 1, 2]), (2, [3, 4, 5]), (3, [6, 7, 8]), (4, [9, 10, 11])]
+EOBS_LAT0, EOBS_LON0, EOBS_RESOL = 35.0, -10.0, 0.25
+SITES_LAT0, SITES_LON0 = 40.1, 0.1        # lie within the EObs grid at all scales
+
+def _month_end(year, month):
+    """
+    last day of month, the EObs time axis is made of month ends
+    """
+    if month == 12:
+        return datetime(year, 12, 31)
+
+    return datetime.fromordinal(datetime(year, month + 1, 1).toordinal() - 1)
+
+def _site_records(nsites, nyears):
+    """
+    generator of season, latitude, longitude, date and values of seasonal records from December 2000 onwards
+    """
+    rand = random.Random(0)
+    for year in range(2001, 2001 + nyears):
+        for season, months in SEASONS:
+            for lat_num in range(nsites):
+                for lon_num in range(nsites):
+                    for month in months:
+                        rec_year = year - 1 if month == 12 else year
+                        yield (season, SITES_LAT0 + EOBS_RESOL*lat_num, SITES_LON0 + EOBS_RESOL*lon_num,
+                                                    datetime(rec_year, month, 15), rand.random()*10.0, 0.5)
+
+def make_eobs_template(eobs_dir, nlats, nlons, nyears, metric = BENCH_METRIC):
+    """
+    write an EObs shaped monthly NetCDF file running from January 1950 to the end of the last year of records
+    """
+    import numpy as np
+    import netCDF4 as cdf
+
+    os.makedirs(eobs_dir, exist_ok=True)
+    nc_fname = os.path.join(eobs_dir, metric + '_0.25deg_reg_v17.0Monthly.nc')
+    dates = [_month_end(year, month) for year in range(1950, 2001 + nyears) for month in range(1, 13)]
+
+    nc_obj = cdf.Dataset(nc_fname, 'w', format='NETCDF4')
+    nc_obj.title = 'synthetic EObs template'
+    nc_obj.createDimension('time', len(dates))
+    nc_obj.createDimension('latitude', nlats)
+    nc_obj.createDimension('longitude', nlons)
+    time_var = nc_obj.createVariable('time', 'f8', ('time',))
+    time_var.units = 'days since 1950-01-01 00:00'
+    time_var.calendar = 'standard'
+    time_var[:] = cdf.date2num(dates, time_var.units, time_var.calendar)
+    nc_obj.createVariable('latitude', 'f4', ('latitude',))[:] = EOBS_LAT0 + EOBS_RESOL*np.arange(nlats)
+    nc_obj.createVariable('longitude', 'f4', ('longitude',))[:] = EOBS_LON0 + EOBS_RESOL*np.arange(nlons)
+    metric_var = nc_obj.createVariable(metric, 'f4', ('time', 'latitude', 'longitude'), fill_value=-9999.0)
+    metric_var.units = 'Celsius'
+    rand_state = np.random.RandomState(0)
+    for indx in range(len(dates)):
+        metric_var[indx] = rand_state.rand(nlats, nlons).astype(np.float32)
+    nc_obj.close()
+
+    return nc_fname
+
+def make_seasonal_csv(csv_fname, nsites, nyears):
+    """
+    write CSV file of seasonal records with csv_headers layout
+    """
+    from excel_to_netcdf_funcs import csv_headers
+
+    nrecs = 0
+    with open(csv_fname, 'w', newline='') as fcsv:
+        fcsv.write(','.join(csv_headers) + '\n')
+        for season, lat, lon, date_obj, value, seasdif in _site_records(nsites, nyears):
+            fcsv.write('{},{:.4f},{:.4f},{},{:.4f},{}\n'.format(season, lat, lon, date_obj.strftime('%d/%m/%Y'),
+                                                                                                value, seasdif))
+            nrecs += 1
+
+    return nrecs
+
+def make_workbook(excel_fname, nsites, nyears):
+    """
+    write workbook with columns A to G as read by convert_excel_file, including records before December 2000
+    which the conversion discards
+    """
+    import openpyxl
+
+    work_book = openpyxl.Workbook(write_only=True)
+    sheet = work_book.create_sheet()
+    sheet.append(['lat', 'lon', 'date', 'year', 'season', 'tg', 'seasdif'])
+    nrecs = 0
+    for season, lat, lon, date_obj, value, seasdif in _site_records(nsites, nyears + 1):
+        date_obj = date_obj.replace(year=date_obj.year - 1)
+        sheet.append([lat, lon, date_obj, float(date_obj.year - 2000), str(season), value, seasdif])
+        nrecs += 1
+    work_book.save(excel_fname)
+
+    return nrecs
+
+def make_run_file(run_fname, nrecs, ncountries = 40):
+    """
+    write DayCent run file, a few records have China or undefined country codes
+    """
+    from run_file_funcs import RUN_FILE_COLUMNS
+
+    rand = random.Random(0)
+    countries = ['Country_{:03d}'.format(indx) for indx in range(ncountries)] + ['China']
+    with open(run_fname, 'w', newline='') as frun:
+        frun.write(','.join(RUN_FILE_COLUMNS) + '\n')
+        for global_id in range(nrecs):
+            country_indx = rand.randrange(len(countries))
+            code = 'NA' if rand.random() < 0.01 else str(100 + country_indx)
+            frun.write('{},{:.4f},{:.4f},{},{},{},{}\n'.format(global_id, rand.uniform(35.0, 70.0),
+                        rand.uniform(-10.0, 40.0), rand.randrange(1, 36), rand.randrange(1, 9), code,
+                                                                                        countries[country_indx]))
+    return nrecs
+
+def make_country_zips(codes_dir, zips_dir, ncountries, nfiles, file_bytes):
+    """
+    write ISO 3166 codes file and one zip of shape files for each country
+    """
+    os.makedirs(codes_dir, exist_ok=True)
+    os.makedirs(zips_dir, exist_ok=True)
+    rand = random.Random(0)
+    nbytes = 0
+    with open(os.path.join(codes_dir, 'country_codes_IS0_3166.csv'), 'w') as fcodes:
+        for indx in range(ncountries):
+            country_code = 'C{:02d}'.format(indx) if indx < 100 else 'D{:02d}'.format(indx - 100)
+            fcodes.write('{},"Country {}"\n'.format(country_code, indx))
+            with zipfile.ZipFile(os.path.join(zips_dir, country_code + '_adm_shp.zip'), 'w',
+                                                                            zipfile.ZIP_DEFLATED) as zip_obj:
+                for file_num in range(nfiles):
+                    data = bytes(rand.getrandbits(4) for dummy in range(file_bytes))
+                    zip_obj.writestr(country_code + '_adm{}.shp'.format(file_num), data)
+                    nbytes += len(data)
+
+    return nbytes
+
+def make_modis_tree(gz_dir, nfiles, nlines):
+    """
+    write gzipped ESRI ASCII grids
+    """
+    os.makedirs(gz_dir, exist_ok=True)
+    rand = random.Random(0)
+    ncols = 100
+    nbytes = 0
+    for file_num in range(nfiles):
+        lines = ['ncols {}'.format(ncols), 'nrows {}'.format(nlines), 'xllcorner 0.0', 'yllcorner 0.0',
+                                                                        'cellsize 0.0041666', 'NODATA_value -9999']
+        for dummy in range(nlines):
+            lines.append(' '.join(str(rand.randrange(100)) for dummy in range(ncols)))
+        data = ('\n'.join(lines) + '\n').encode()
+        with gzip.open(os.path.join(gz_dir, 'modis_{:03d}.asc.gz'.format(file_num)), 'wb') as fgz:
+            fgz.write(data)
+        nbytes += len(data)
+
+    return nbytes
+
+def make_spec_study(spec_dir, degrees):
+    """
+    write study manifest used by create_NCfile to define the extent of the study
+    """
+    sims_dir = os.path.join(spec_dir, BENCH_STUDY)
+    os.makedirs(sims_dir, exist_ok=True)
+    ll_lat, ll_lon = 50.0, 0.0
+    with open(os.path.join(spec_dir, BENCH_STUDY + '_summary_manifest.csv'), 'w') as fmani:
+        fmani.write('\t'.join(str(val) for val in ['a', 'b', ll_lat, ll_lon, 'c', 'd', ll_lat + degrees,
+                                                                            ll_lon + degrees, 'e', 'f']) + '\n')
+    return sims_dir
+
+def generate_inputs(work_dir, scale = 'small'):
+    """
+    generate all inputs for a scale in work_dir and return their description
+    """
+    params = BENCH_SCALES[scale]
+    inputs_dir = os.path.join(work_dir, 'inputs_' + scale)
+    inputs_fname = os.path.join(inputs_dir, 'inputs.json')
+    if os.path.isfile(inputs_fname):
+        with open(inputs_fname, 'r') as finps:
+            return json_load(finps)
+
+    start_time = perf_counter()
+    print('Generating {} inputs in {}...'.format(scale, inputs_dir))
+    datasets_dir = os.path.join(inputs_dir, 'datasets')
+    os.makedirs(datasets_dir, exist_ok=True)
+    nlats, nlons = params['eobs']
+    nyears = params['nyears']
+    inputs = {'scale': scale, 'inputs_dir': inputs_dir, 'params': params}
+
+    inputs['eobs_dir'] = os.path.join(inputs_dir, 'eobs')
+    inputs['eobs_fname'] = make_eobs_template(inputs['eobs_dir'], nlats, nlons, nyears)
+
+    inputs['excel_fname'] = os.path.join(datasets_dir, 'Bench_Tg.xlsx')
+    inputs['excel_recs'] = make_workbook(inputs['excel_fname'], params['xl_sites'], nyears)
+
+    inputs['csv_fname'] = os.path.join(datasets_dir, 'Bench_Tg.csv')
+    inputs['csv_recs'] = make_seasonal_csv(inputs['csv_fname'], params['sites'], nyears)
+
+    inputs['run_fname'] = os.path.join(inputs_dir, 'run_file.csv')
+    inputs['run_recs'] = make_run_file(inputs['run_fname'], params['run_recs'])
+
+    ncountries, nfiles, file_bytes = params['zips']
+    inputs['country_codes'] = os.path.join(inputs_dir, 'country_codes')
+    inputs['country_zips'] = os.path.join(inputs_dir, 'country_zips')
+    inputs['zip_bytes'] = make_country_zips(inputs['country_codes'], inputs['country_zips'], ncountries, nfiles,
+                                                                                                        file_bytes)
+    inputs['zip_files'] = ncountries*nfiles
+
+    nfiles, nlines = params['modis']
+    inputs['modis_dir'] = os.path.join(inputs_dir, 'modis', 'gz')
+    inputs['modis_bytes'] = make_modis_tree(inputs['modis_dir'], nfiles, nlines)
+    inputs['modis_lines'] = nfiles*(nlines + 6)
+
+    degrees, inputs['spec_years'] = params['spec']
+    inputs['spec_dir'] = os.path.join(inputs_dir, 'spec')
+    inputs['sims_dir'] = make_spec_study(inputs['spec_dir'], degrees)
+
+    with open(inputs_fname, 'w') as finps:
+        json_dump(inputs, finps, indent=2)
+    print('Generated inputs in {:.1f} seconds'.format(perf_counter() - start_time))
+
+    return inputs
+
+def _peak_rss_mb():
+    """
+    peak resident memory of this process in MB, None if it cannot be determined
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        mem_info = psutil.Process().memory_info()
+        return getattr(mem_info, 'peak_wset', mem_info.rss)/MB
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return max_rss/MB       # bytes on macOS, kilobytes elsewhere
+
+    return max_rss/1024
+
+def _bench_form(inputs, out_dir):
+    """
+    headless form carrying the attributes read by the operations
+    """
+    from EurasiaUtilsCLI import _headless_form
+
+    params = {'excel_fname': inputs['excel_fname'], 'run_fname': inputs['run_fname'],
+              'eobs_dir': inputs['eobs_dir'], 'country_codes': os.path.join(out_dir, 'country_codes'),
+              'country_zips': inputs['country_zips'], 'shp_dir': os.path.join(out_dir, 'shp'),
+              'sims_dir': inputs['sims_dir'], 'outdir': out_dir, 'fut_clim_scen': 'A1B', 'land_use': 'ara2gra',
+              'fut_start_year': 2006, 'fut_end_year': 2005 + inputs['spec_years']}
+
+    return _headless_form(params)
+
+def _run_benchmark(name, inputs, out_dir):
+    """
+    prepare, then time a single operation; runs in its own process
+    return dictionary of status of the operation, elapsed time, rows and bytes processed and peak memory
+    """
+    from EurasiaUtilsCLI import _job_status
+    import eurasia_funcs
+    import excel_to_netcdf_funcs
+    import netcdf_funcs
+    import spec_NCfuncs
+
+    os.makedirs(out_dir, exist_ok=True)
+    os.chdir(out_dir)       # any output written to a default path lands here
+    form = _bench_form(inputs, out_dir)
+
+    if name in ('create_netcdf_file', 'create_netcdf_vector', 'create_netcdf_row'):
+        from pandas import read_csv
+
+        # window, whole variable and record by record splices
+        # ===================================================
+        data_frame = read_csv(inputs['csv_fname'], sep=',', names=excel_to_netcdf_funcs.csv_headers, skiprows=1)
+        nc_fname = os.path.join(out_dir, 'bench_create.nc')
+        kwargs = {'vector_flag': name != 'create_netcdf_row', 'window_flag': name == 'create_netcdf_file',
+                                                                                                'results_fname': None}
+        func, args = netcdf_funcs.create_netcdf_file, (inputs['eobs_fname'], nc_fname, BENCH_METRIC, data_frame, True)
+        nrows, size_func = len(data_frame), lambda: os.path.getsize(nc_fname)
+
+    elif name == 'convert_csv_file':
+        func, args, kwargs = excel_to_netcdf_funcs.convert_csv_file, (form,), {}
+        nrows, size_func = inputs['csv_recs'], lambda: os.path.getsize(inputs['csv_fname'])
+
+    elif name in ('convert_excel_file', 'convert_excel_stream'):
+        func, args, kwargs = excel_to_netcdf_funcs.convert_excel_file, (form,), \
+                                                                {'stream_flag': name == 'convert_excel_stream'}
+        nrows, size_func = inputs['excel_recs'], lambda: os.path.getsize(inputs['excel_fname'])
+
+    elif name in ('create_codes_table', 'create_codes_table_cached'):
+
+        # the chunked reader is timed without a cache, the cached benchmark times loads of a cache built beforehand
+        # =========================================================================================================
+        shutil.rmtree(inputs['run_fname'] + '.cache', ignore_errors=True)
+        if name == 'create_codes_table_cached':
+            from run_file_funcs import open_run_cache
+
+            form.settings['run_cache'] = True
+            open_run_cache(inputs['run_fname'])
+        os.makedirs(form.country_codes, exist_ok=True)
+        func, args, kwargs = eurasia_funcs._create_codes_table, (form,), {}
+        nrows, size_func = inputs['run_recs'], lambda: os.path.getsize(inputs['run_fname'])
+
+    elif name == 'generate_country_shape_files':
+        shutil.rmtree(form.shp_dir, ignore_errors=True)
+        shutil.copytree(inputs['country_codes'], form.country_codes, dirs_exist_ok=True)
+        os.makedirs(form.shp_dir)
+        func, args, kwargs = eurasia_funcs._generate_country_shape_files, (form,), {}
+        nrows, size_func = inputs['zip_files'], lambda: inputs['zip_bytes']
+
+    elif name == 'reformat_modis_files':
+        gz_dir = os.path.join(out_dir, 'modis', 'gz')
+        shutil.rmtree(os.path.dirname(gz_dir), ignore_errors=True)
+        shutil.copytree(inputs['modis_dir'], gz_dir)
+        func, args, kwargs = eurasia_funcs._reformat_modis_files, (gz_dir,), {}
+        nrows, size_func = inputs['modis_lines'], lambda: inputs['modis_bytes']
+
+    elif name == 'create_NCfile':
+        nc_fname = os.path.join(out_dir, BENCH_STUDY + '.nc')
+        func, args, kwargs = spec_NCfuncs.create_NCfile, (form, SUMMARY_VARNAMES), {}
+        nrows, size_func = None, lambda: os.path.getsize(nc_fname)
+    else:
+        raise ValueError('benchmark ' + name + ' not recognised - must be one of ' + str(BENCH_NAMES))
+
+    start_time = perf_counter()
+    status = _job_status(func(*args, **kwargs))
+    elapsed = perf_counter() - start_time
+    if status != 'OK':
+        return {'name': name, 'status': status}
+
+    if name == 'create_NCfile':
+        with spec_NCfuncs.cdf.Dataset(nc_fname) as nc_obj:
+            nrows = len(nc_obj.dimensions['lat'])*len(nc_obj.dimensions['lon'])     # grid cells defined
+    nbytes = size_func()
+
+    return {'name': name, 'status': status, 'elapsed': elapsed, 'nrows': nrows, 'nbytes': nbytes,
+            'rows_per_sec': nrows/elapsed if elapsed > 0 else None,
+            'mb_per_sec': nbytes/MB/elapsed if elapsed > 0 else None, 'peak_rss_mb': _peak_rss_mb()}
+
+def _benchmark_process(name, inputs, out_dir, result_queue):
+    """
+    target of the spawned process for each benchmark
+    """
+    try:
+        result = _run_benchmark(name, inputs, out_dir)
+    except Exception as err:
+        result = {'name': name, 'status': 'failed - {}: {}'.format(type(err).__name__, err)}
+    result_queue.put(result)
+
+def _wait_for_result(name, proc, result_queue):
+    """
+    return result put by the benchmark process, a failed result if the process exits without putting one
+    """
+    while proc.is_alive():
+        try:
+            return result_queue.get(timeout = result_poll_secs)
+        except Empty:
+            pass
+
+    try:
+        return result_queue.get(timeout = result_poll_secs)
+    except Empty:
+        return {'name': name, 'status': 'failed - process exited with code {}'.format(proc.exitcode)}
+
+def run_benchmarks(work_dir, scale = 'small', names = None, repeat = 1, results_fname = None):
+    """
+    generate inputs then run each benchmark repeat times, each in a new process
+    return results, which are also written to results_fname if given
+    """
+    if names is None:
+        names = BENCH_NAMES
+    inputs = generate_inputs(work_dir, scale)
+
+    mp_context = multiprocessing.get_context('spawn')
+    results = []
+    for name in names:
+        for run_num in range(repeat):
+            out_dir = os.path.join(work_dir, 'outputs_' + scale, name)
+            result_queue = mp_context.Queue()
+            proc = mp_context.Process(target=_benchmark_process, args=(name, inputs, out_dir, result_queue))
+            proc.start()
+            result = _wait_for_result(name, proc, result_queue)
+            proc.join()
+            result['run_num'] = run_num
+            results.append(result)
+            if result['status'] == 'OK':
+                print('{:30}\t{:8.2f}s\t{:12.0f} rows/s\t{:8.2f} MB/s\tpeak RSS: {} MB'.format(name,
+                    result['elapsed'], result['rows_per_sec'] or 0, result['mb_per_sec'] or 0,
+                                        'n/a' if result['peak_rss_mb'] is None else round(result['peak_rss_mb'])))
+            else:
+                print(ERROR_STR + '{} {}'.format(name, result['status']))
+
+    bench_run = {'created': strftime('%Y-%m-%d %H:%M:%S'), 'scale': scale, 'python': platform.python_version(),
+                 'platform': platform.platform(), 'processors': os.cpu_count(), 'results': results}
+    if results_fname is not None:
+        with open(results_fname, 'w') as fres:
+            json_dump(bench_run, fres, indent=2)
+        print('Wrote benchmark results to ' + results_fname)
+
+    return bench_run
+
+def compare_results(base_fname, new_fname):
+    """
+    print ratio of elapsed times of benchmarks common to two results files, best of repeats
+    """
+    best = []
+    for results_fname in (base_fname, new_fname):
+        with open(results_fname, 'r') as fres:
+            bench_run = json_load(fres)
+        times = {}
+        for result in bench_run['results']:
+            if result['status'] == 'OK':
+                times[result['name']] = min(result['elapsed'], times.get(result['name'], result['elapsed']))
+        best.append(times)
+
+    print('{:30}\t{:>10}\t{:>10}\t{:>8}'.format('benchmark', 'base s', 'new s', 'speedup'))
+    for name in BENCH_NAMES:
+        if name in best[0] and name in best[1]:
+            print('{:30}\t{:10.3f}\t{:10.3f}\t{:8.2f}'.format(name, best[0][name], best[1][name],
+                                                                                best[0][name]/max(best[1][name], 1e-9)))
+    return best
+
+def main():
+    """
+    run benchmarks from the command line
+    """
+    parser = argparse.ArgumentParser(description = 'Benchmark EurasiaUtils operations on synthetic inputs')
+    parser.add_argument('work_dir', help = 'directory for generated inputs and outputs')
+    parser.add_argument('--scale', choices = list(BENCH_SCALES), default = 'small')
+    parser.add_argument('--only', help = 'comma separated benchmarks, default all of ' + ', '.join(BENCH_NAMES))
+    parser.add_argument('--repeat', type = int, default = 1)
+    parser.add_argument('--out', help = 'JSON file of results')
+    parser.add_argument('--compare', help = 'JSON file of earlier results to compare with --out')
+    args = parser.parse_args()
+
+    if args.compare is not None and args.out is None:
+        print(ERROR_STR + '--compare requires --out')
+        return 1
+
+    names = None
+    if args.only is not None:
+        names = args.only.split(',')
+        unknown = [name for name in names if name not in BENCH_NAMES]
+        if len(unknown) > 0:
+            print(ERROR_STR + 'benchmarks {} not recognised'.format(unknown))
+            return 1
+
+    bench_run = run_benchmarks(args.work_dir, args.scale, names, args.repeat, args.out)
+    if args.compare is not None:
+        compare_results(args.compare, args.out)
+
+    return int(any(result['status'] != 'OK' for result in bench_run['results']))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,44 +13,154 @@ __version__ = '0.0.1'
 __author__ = 's03mm5'
 
 import os
-import csv
-import subprocess
-from sbs_misc_utils import fetch_granular_lat_lons
+import gzip
+import zlib
+import shutil
+import struct
+from json import load as json_load
+from sbs_misc_utils import file_digest, write_json_atomic
+from run_file_funcs import country_codes_table, open_run_cache
+from stage_timer import form_timer
 import time
-from unidecode import unidecode
+import zipfile
 from glob import glob
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+ERROR_STR = '*** Error *** '
 max_run_records_read = 400000
 wetland_lus = [1, 5, 7, 11, 17, 22, 24, 28, 29]
 MISSING = -9999
 MAX_SOIL_TYPE = 8
 MAX_LANDUSE = 35
+GUNZIP_BLOCK_SIZE = 1024*1024
+UNPACK_MANIFEST = 'unpack_manifest.json'
 
-def _reformat_modis_files(dirname):
+def _gz_uncompressed_size(gz_fname):
+    """
+    return uncompressed size modulo 2**32 as recorded in the trailer of a gzip file
+    """
+    with open(gz_fname, 'rb') as fobj:
+        fobj.seek(-4, os.SEEK_END)
+        return struct.unpack('<I', fobj.read(4))[0]
 
-    decompressor = 'C:\\Program Files\\7-Zip\\7z.exe'
-    if not os.path.isfile(decompressor):
-        print('Decompression executable ' + decompressor + ' must exist')
-        return
+def _count_lines(fname):
+    """
+    count lines of a file reading fixed size blocks, a final line without a newline is included
+    """
+    nlines = 0
+    last_block = b''
+    with open(fname, 'rb') as fobj:
+        for block in iter(lambda: fobj.read(GUNZIP_BLOCK_SIZE), b''):
+            nlines += block.count(b'\n')
+            last_block = block
+
+    if len(last_block) > 0 and not last_block.endswith(b'\n'):
+        nlines += 1
+
+    return nlines
+
+def _ascii_grid_nlines(fname):
+    """
+    return expected number of lines of an ESRI ASCII grid from its header, None if the file has no such header
+    """
+    nheader = 0
+    nrows = None
+    with open(fname, 'rb') as fobj:
+        for line in fobj:
+            fields = line.split()
+            if len(fields) != 2 or not fields[0][:1].isalpha():
+                break
+            nheader += 1
+            if fields[0].lower() == b'nrows':
+                nrows = int(fields[1])
+
+    if nrows is None:
+        return None
+
+    return nheader + nrows
+
+def _modis_output_valid(gz_fname, asc_fname):
+    """
+    fast check that an existing output is complete: its size must agree with the gzip trailer and, for
+    ASCII grids, its number of lines must agree with the header
+    """
+    if os.path.getsize(asc_fname) % 2**32 != _gz_uncompressed_size(gz_fname):
+        return False
+
+    nlines_expected = _ascii_grid_nlines(asc_fname)
+    if nlines_expected is not None and _count_lines(asc_fname) != nlines_expected:
+        return False
+
+    return True
+
+def _gunzip_modis_file(gz_fname, asc_fname):
+    """
+    decompress gz_fname to asc_fname in fixed size blocks unless a valid output already exists
+    output is written to a temporary file which is renamed on completion
+    """
+    start_time = time.time()
+    if os.path.isfile(asc_fname):
+        if _modis_output_valid(gz_fname, asc_fname):
+            return 'valid', 0, time.time() - start_time
+        status = 'redone'
+    else:
+        status = 'unpacked'
+
+    part_fname = asc_fname + '.part'
+    try:
+        with gzip.open(gz_fname, 'rb') as fin, open(part_fname, 'wb') as fout:
+            shutil.copyfileobj(fin, fout, GUNZIP_BLOCK_SIZE)
+    except (OSError, EOFError, zlib.error):
+        if os.path.isfile(part_fname):
+            os.remove(part_fname)
+        raise
+    os.replace(part_fname, asc_fname)
 
+    return status, os.path.getsize(asc_fname), time.time() - start_time
+
+def _reformat_modis_files(dirname, max_workers = None):
+    """
+    decompress MODIS .gz files in dirname to its parent directory using a pool of max_workers threads
+    existing outputs are checked and are only redone if they are incomplete
+    return numbers of files already valid, redone, unpacked and failed
+    """
     out_dir, dummy = os.path.split(dirname)
-    flist = glob(dirname + '\\*.gz')
-    for gz_fname in flist:
-        fname, extens = os.path.splitext(gz_fname)
-        dummy, file_name = os.path.split(fname)
-        asc_fname = os.path.join(out_dir, file_name)
-        if not os.path.isfile(asc_fname):
-            output = subprocess.check_output([decompressor,'x','-o' + out_dir, gz_fname])
-        else:
-            # check number of lines
-            pass
+    flist = glob(os.path.join(dirname, '*.gz'))
+
+    start_time = time.time()
+    counts = {'valid': 0, 'redone': 0, 'unpacked': 0, 'failed': 0}
+    nbytes = 0
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        futures = {}
+        for gz_fname in flist:
+            fname, extens = os.path.splitext(gz_fname)
+            dummy, file_name = os.path.split(fname)
+            asc_fname = os.path.join(out_dir, file_name)
+            futures[executor.submit(_gunzip_modis_file, gz_fname, asc_fname)] = gz_fname
+
+        for future in as_completed(futures):
+            try:
+                status, nbytes_out, elapsed = future.result()
+            except (OSError, EOFError, zlib.error) as err:
+                print(ERROR_STR + 'could not decompress {}\t{}'.format(futures[future], err))
+                counts['failed'] += 1
+                continue
 
-    return
+            counts[status] += 1
+            nbytes += nbytes_out
+
+    elapsed = time.time() - start_time
+    print('Processed {} MODIS files in {:.1f} seconds\tunpacked: {}\tredone: {}\talready valid: {}\tfailed: {}'
+          '\t{:.1f} MB written'.format(len(flist), elapsed, counts['unpacked'], counts['redone'], counts['valid'],
+                                                                                counts['failed'], nbytes/(1024*1024)))
+    return counts
 
 def _create_codes_table(form):
     """
     Read Daycent run file and extract Code_CindyPotsdam and CountryName fields then write these to a CSV
                                                            file comprising country names and codes
+    if the run_cache setting is true the codes are taken from the binary cache of the run file, built on first use
+    return name of the CSV file, None if the run file does not exist
     """
     func_name =  __prog__ + '\t _create_codes_table'
 
@@ -68,66 +178,134 @@ def _create_codes_table(form):
         print('File ' + run_fname + 'does not exist')
         return
 
-    finp_run = open(form.run_fname, 'r')
-    finp_run_reader = csv.reader(finp_run)
-    header_row = next(finp_run_reader) # skip header
-
-    # Read one line at at time
-    # ========================
-    n_china = 0
-    n_undefined = 0
-    nread = 0
-    country_dict = {}
-    for row in finp_run_reader:
-        nread += 1
-        globalID = row[0]
-        latitude = float(row[1])
-        longitude = float(row[2])
-        landuse = int(row[3])    # landuse
-        soiltype = int(row[4])
-
-        # skip China
-        if row[6] == 'China':
-            n_china += 1
-            continue
-
-        # report only
-        if not row[5].isnumeric():
-            n_undefined += 1
-            continue
-        else:
-            country_id = int(row[5])
-
-        country = row[6]
-        if country not in country_dict.keys():
-            country_dict[country] = country_id
+    with form_timer(form, '_create_codes_table') as timer:
 
-    finp_run.close()
+        # parse country code and country columns in chunks across processes unless the cache is requested
+        # ================================================================================================
+        with timer.stage('read', 0, os.path.getsize(run_fname)):
+            run_cache = None
+            if getattr(form, 'settings', {}).get('run_cache', False):
+                run_cache = open_run_cache(run_fname)
+            if run_cache is None:
+                country_dict, n_china, n_undefined = country_codes_table(run_fname)
+            else:
+                country_dict, n_china, n_undefined = run_cache.country_codes_table()
 
-    # write dictionary to CSV file
-    # ============================
-    res_obj = open(results_fname, 'w', newline='')
-    for country in sorted(country_dict.keys()):
-        res_obj.write('{},{}\n'.format(country,country_dict[country]))
-    res_obj.close()
+        # write dictionary to CSV file
+        # ============================
+        with timer.stage('write', len(country_dict)) as stage_rec:
+            res_obj = open(results_fname, 'w', newline='')
+            for country in sorted(country_dict.keys()):
+                res_obj.write('{},{}\n'.format(country,country_dict[country]))
+            stage_rec.add(nbytes = res_obj.tell())
+            res_obj.close()
 
     print('File inspection completed, wrote {} country codes to {}\n\tnumber of China records: {}\tcountry undefined: {}'
           .format(len(country_dict), results_fname, n_china, n_undefined))
 
-    return
+    return results_fname
 
-def _generate_country_shape_files(form):
+def _read_unpack_manifest(manifest_fname):
+    """
+    return manifest of previously unpacked zip files keyed by zip file name, empty if none or unreadable
+    """
+    if not os.path.isfile(manifest_fname):
+        return {}
+
+    try:
+        with open(manifest_fname, 'r') as fmani:
+            return json_load(fmani)
+    except (OSError, ValueError) as err:
+        print('Could not read manifest {} - all zip files will be checked: {}'.format(manifest_fname, err))
+        return {}
+
+def _unpacked_files_complete(out_dir, files):
+    """
+    check that each file extracted from a zip file exists in out_dir with the size recorded for it
+    """
+    for file_name, file_size in files.items():
+        fname = os.path.join(out_dir, file_name)
+        if not os.path.isfile(fname) or os.path.getsize(fname) != file_size:
+            return False
+
+    return True
+
+def _unpack_country_zip(zip_fname, out_dir, entry):
+    """
+    extract all members of a zip file to out_dir unless the digest of the zip file and out_dir are unchanged since the
+    manifest entry was recorded and the extracted files are complete
+    a zip file without a manifest entry whose shape files were unpacked by a version without the manifest is recorded
+    without extracting it again if its files are complete
+    return new manifest entry, number of files extracted and time taken
+    """
+    start_time = time.time()
+    zip_stat = os.stat(zip_fname)
+    digest = file_digest(zip_fname)
+
+    with zipfile.ZipFile(zip_fname) as zip_obj:
+        files = {info.filename: info.file_size for info in zip_obj.infolist() if not info.is_dir()}
+
+        # files of the same size from a changed zip file may still differ so only an unchanged digest is trusted
+        # ======================================================================================================
+        unchanged = entry is not None and entry.get('sha1') == digest and entry.get('out_dir') == out_dir
+        unpacked_before = entry is None and len(glob(os.path.join(out_dir, '*.shp'))) > 0
+        if unchanged and _unpacked_files_complete(out_dir, entry['files']):
+            files = entry['files']
+            nfiles = 0
+        elif unpacked_before and _unpacked_files_complete(out_dir, files):
+            nfiles = 0
+        else:
+            os.makedirs(out_dir, exist_ok=True)
+            zip_obj.extractall(out_dir)
+            nfiles = len(files)
+
+    entry = {'size': zip_stat.st_size, 'mtime': zip_stat.st_mtime_ns, 'sha1': digest, 'out_dir': out_dir,
+                                                                                                    'files': files}
+    return entry, nfiles, time.time() - start_time
+
+def _unpack_country_zips(zip_jobs):
+    """
+    unpack zip files which share an output directory one after another so that no two threads extract to the same
+    directory, zip_jobs is a list of zip file, output directory and manifest entry
+    return list of the result of _unpack_country_zip, or the error raised, for each zip file
+    """
+    results = []
+    for zip_fname, out_dir, entry in zip_jobs:
+        try:
+            results.append(_unpack_country_zip(zip_fname, out_dir, entry))
+        except (zipfile.BadZipFile, OSError) as err:
+            results.append(err)
+
+    return results
+
+def _generate_country_shape_files(form, max_workers = None):
     """
     Main loop for generating outputs:
+    zip files are extracted in process on a pool of max_workers threads, default is number of processors, zip files
+    of the same country are extracted by the same thread
+    a manifest in shp_dir records the size, modification time and digest of each zip file and the files extracted
+    from it so that only zip files which have changed or whose outputs are incomplete are extracted
+    return numbers of countries unpacked and of zip files which could not be unpacked
+    """
+    with form_timer(form, '_generate_country_shape_files') as timer:
+        return _unpack_country_shape_files(form, max_workers, timer)
+
+def _unpack_country_shape_files(form, max_workers, timer):
+    """
+    body of _generate_country_shape_files, stages are timed by timer
     """
     func_name =  __prog__ + '\t _generate_country_shape_files'
 
+    from unidecode import unidecode
+
     # read codes and country names for whole world
     # ============================================
     country_codes_IS0_3166_fname = os.path.join(form.country_codes,'country_codes_IS0_3166.csv')
-    fread_obj = open(country_codes_IS0_3166_fname, 'r')
-    lines = fread_obj.readlines()
-    fread_obj.close()
+    with timer.stage('read', 0, os.path.getsize(country_codes_IS0_3166_fname)) as stage_rec:
+        fread_obj = open(country_codes_IS0_3166_fname, 'r')
+        lines = fread_obj.readlines()
+        fread_obj.close()
+        stage_rec.add(len(lines))
 
     # build dictionary with 3 letter code as key
     # ==========================================
@@ -149,36 +327,140 @@ def _generate_country_shape_files(form):
     country_code_dict['XKO'] = 'Kosovo'
     country_code_dict['XNC'] = 'Northern_Cyprus'
 
-    # get the zip files
-    # =================
+    # get the zip files and identify those which need unpacking - a zip file whose size and modification time are
+    # unchanged is skipped if its extracted files are complete, otherwise its digest is checked by the unpack job
+    # ============================================================================================================
+    manifest_fname = os.path.join(form.shp_dir, UNPACK_MANIFEST)
+    with timer.stage('validate') as stage_rec:
+        manifest = _read_unpack_manifest(manifest_fname)
+        unpack_jobs = []
+        flist = glob(os.path.join(form.country_zips, '*.zip'))
+        for zip_fname in flist:
+            fname, extens = os.path.splitext(zip_fname)
+            dummy, file_name = os.path.split(fname)
+            country_code = file_name[0:3]    # first three letters
+            if country_code in country_code_dict.keys():
+                country = country_code_dict[country_code]
+                out_dir = os.path.join(form.shp_dir, country)
+
+                entry = manifest.get(file_name)
+                if entry is not None and entry['out_dir'] == out_dir:
+                    zip_stat = os.stat(zip_fname)
+                    if entry['size'] == zip_stat.st_size and entry['mtime'] == zip_stat.st_mtime_ns:
+                        if _unpacked_files_complete(out_dir, entry['files']):
+                            print('{} files already unpacked in {} - nothing to do....'
+                                                                                .format(len(entry['files']), out_dir))
+                            continue
+
+                unpack_jobs.append((country_code, country, file_name, zip_fname, out_dir, entry))
+            else:
+                print('Country code: {} not in country codes'.format(country_code))
+        stage_rec.add(len(flist))
+
+    # unpack concurrently, one job for each output directory
+    # ======================================================
+    out_dir_jobs = {}
+    for unpack_job in unpack_jobs:
+        out_dir_jobs.setdefault(unpack_job[4], []).append(unpack_job)
+
+    if max_workers is None:
+        max_workers = os.cpu_count()
+    start_time = time.time()
     n_countries = 0
-    flist = glob(form.country_zips + '\\*.zip')
-    for zip_fname in flist:
-        fname, extens = os.path.splitext(zip_fname)
-        dummy, file_name = os.path.split(fname)
-        country_code = file_name[0:3]    # first three letters
-        if country_code in country_code_dict.keys():
-            country = country_code_dict[country_code]
-            out_dir = form.shp_dir + '\\' + country
-
-            # check that directory exists but if not then create it
-            if os.path.isdir(out_dir):
-                flist = glob(out_dir + '\\*.shp')
-                nshapes = len(flist)
-                if nshapes > 0:
-                    print('{} shape files already exist in {} - nothing to do....'.format(nshapes, out_dir ))
+    n_failed = 0
+    with timer.stage('write') as stage_rec, ThreadPoolExecutor(max_workers = max_workers) as executor:
+        futures = {}
+        for out_dir, jobs in out_dir_jobs.items():
+            zip_jobs = [(zip_fname, out_dir, entry) for dummy, dummy, dummy, zip_fname, dummy, entry in jobs]
+            futures[executor.submit(_unpack_country_zips, zip_jobs)] = jobs
+
+        for future in as_completed(futures):
+            for (country_code, country, file_name, dummy, dummy, dummy), result in zip(futures[future],
+                                                                                                    future.result()):
+                if isinstance(result, Exception):
+                    print(ERROR_STR + 'could not unpack country code: {}\tcountry: {}\t{}'
+                                                                                .format(country_code, country, result))
+                    n_failed += 1
                     continue
-            else:
-                os.mkdir(out_dir)
 
-            print('Unpacking country code: {}\tcountry: {}'.format(country_code, country))
-            output = subprocess.check_output([form.decompressor,'x','-y','-o' + out_dir, zip_fname])
-            n_countries += 1
-        else:
-            print('Country code: {} not in country codes'.format(country_code))
+                manifest[file_name], nfiles, elapsed = result
+                if nfiles == 0:
+                    print('Country code: {}\tcountry: {}\tunchanged, files already complete'
+                                                                                    .format(country_code, country))
+                    continue
+
+                stage_rec.add(nfiles, sum(manifest[file_name]['files'].values()))
+                print('Unpacked country code: {}\tcountry: {}\t{} files in {:.2f} seconds'
+                                                                    .format(country_code, country, nfiles, elapsed))
+                n_countries += 1
+
+    if len(unpack_jobs) > 0:
+        with timer.stage('flush', len(manifest)):
+            os.makedirs(form.shp_dir, exist_ok=True)
+            write_json_atomic(manifest_fname, manifest)
+    print('Finished unpacking {} countries in {:.1f} seconds...'.format(n_countries, time.time() - start_time))
+
+    return {'nunpacked': n_countries, 'nfailed': n_failed}
+
+def _test_hwsd_v1_access(lggr, hwsd_dir, mmap_flag = False):
+    """
+    retrieve HWSD V1 soil for a single point, if mmap_flag is set the raster is memory mapped
+    return mu_globals of the point, None if there are no soil records
+    """
+    lat, lon = (28.1, 74.23)
+    if mmap_flag:
+        from hwsd_raster import HwsdMmap
+
+        hwsd = HwsdMmap(lggr, hwsd_dir)
+    else:
+        from hwsd_bil import HWSD_bil
+
+        hwsd = HWSD_bil(lggr, hwsd_dir)
+    nvals_read = hwsd.read_bbox_mu_globals([lon, lat], snglPntFlag=True)
+    mu_globals = hwsd.get_mu_globals_dict()
+    if mu_globals is None:
+        print('No soil records for this area\n')
+        return
+
+    # create and instantiate a new class NB this stanza enables single site
+    # ==================================
+    hwsd_mu_globals = type('test', (), {})()
+    hwsd_mu_globals.soil_recs = hwsd.get_soil_recs(mu_globals)
+    if len(mu_globals) == 0:
+        print('No soil data for this area\n')
+        return
+
+    mu_globals_props = {next(iter(mu_globals)): 1.0}
+
+    mess = 'Retrieved {} values  of HWSD grid consisting of {} rows and {} columns: ' \
+           '\n\tnumber of unique mu_globals: {}'.format(nvals_read, hwsd.nlats, hwsd.nlons, len(mu_globals))
+    print(mess)
+
+    return mu_globals
+
+def _test_hwsd_v2_access(access_db_fn):
+    """
+    list tables of HWSD V2 database and retrieve layers for a single SMU
+    access_db_fn may also be a SQLite copy of the Access database
+    return layers of the SMU, None if the database could not be opened
+    """
+    from hwsd2_query import Hwsd2Query, LAYERS_TABLE
+
+    try:
+        hwsd2 = Hwsd2Query(access_db_fn)
+    except (FileNotFoundError, RuntimeError) as err:
+        print(ERROR_STR + str(err))
+        return
+
+    with hwsd2:
+        for table_name in hwsd2.tables():
+            print(table_name)
 
-    print('Finished unpacking {} countries...'.format(n_countries))
+        for col_name in hwsd2.columns(LAYERS_TABLE):
+            print(col_name)
 
+        smu_recs = hwsd2.layers_for_smus([9612])
 
-    return
+    print('Retrieved {} layers for SMU 9612'.format(len(smu_recs.get(9612, []))))
 
+    return smu_recs
@@ -18,26 +18,65 @@ __version__ = '1.0.1'
 # 1.0.1
 
 from glob import glob
+from concurrent.futures import ProcessPoolExecutor
 from csv import writer
+from datetime import datetime
+from itertools import islice
 import os
 import time
-from xlrd import open_workbook, xldate
-import netCDF4 as cdf
-from netcdf_funcs import create_netcdf_file, writeNC_set, getNC_coords
-from pandas import read_csv
-from numpy import int32, float64
+from netcdf_funcs import create_netcdf_file, results_fname_default
+from nc_checkpoint import input_fingerprint
+from stage_timer import StageTimer, form_timer
+from pandas import read_csv, DataFrame
+from numpy import float64
+import numpy as np
 
 csv_headers = list(['season', 'latitude', 'longitude', 'date', 'rr_tg', 'seasdif'])
 metric_dict = {'Tg':'tg', 'Precip': 'rr'}
+excel_columns = ['latitude', 'longitude', 'date_time', 'year', 'season', 'tg', 'seasdif']    # columns A to G
+excel_batch_size = 20000
 
-def convert_csv_file(form):
+def _metric_and_eobs_fname(excel_fname, eobs_dir):
+    '''
+    return metric and EObs NetCDF file corresponding to the metric name suffix of the Excel file name
+    '''
+    root_fname, exten = os.path.splitext(excel_fname)
+    metric_name = root_fname.split('_')[-1]
+    if metric_name not in metric_dict:
+        print('Metric name ' + metric_name + ' not recognised - must be one of ' + str(metric_dict.keys()) )
+        return None, None
+
+    metric = metric_dict[metric_name]
+
+    # EObs must exist
+    # ===============
+    eobs_nc_fnames = glob(eobs_dir + '/' + metric + '*0Monthly.nc')
+    if len(eobs_nc_fnames) == 0:
+        print('No EObs file in ' + eobs_dir)
+        return None, None
+
+    return metric, eobs_nc_fnames[0]
+
+def convert_csv_file(form, window_flag = False, profile = None, resume_flag = False):
 
     '''
     read Csv file and create NetCDF based on EObs data
     NB the presumption is that the data set is pre-sorted
         in case this changes then: data_frame = data_frame.sort_values(by=["latitude","longitude",'date'])
     '''
-    excel_fname = form.w_lbl05.text()
+    with form_timer(form, 'convert_csv_file') as timer:
+        return csv_to_netcdf(form.w_lbl05.text(), form.eobs_dir, window_flag = window_flag, profile = profile,
+                                                                        resume_flag = resume_flag, timer = timer)
+
+def csv_to_netcdf(excel_fname, eobs_dir, window_flag = False, profile = None,
+                                        results_fname = results_fname_default, resume_flag = False, timer = None):
+    '''
+    create NetCDF based on EObs data from the CSV file saved from the Excel file - see convert_csv_file
+    '''
+    if timer is None:
+        with StageTimer(operation = 'csv_to_netcdf') as timer:
+            return csv_to_netcdf(excel_fname, eobs_dir, window_flag, profile, results_fname, resume_flag, timer)
+
     if not os.path.isfile(excel_fname):
         print('Excel file ' + excel_fname + ' does not exist')
         return
@@ -51,18 +90,8 @@ def convert_csv_file(form):
         print('No derived csv file in ' + datasets_dir)
         return
 
-    metric_name = root_fname.split('_')[-1]
-    if metric_name not in metric_dict:
-        print('Metric name ' + metric_name + ' not recognised - must be one of ' + str(metric_dict.keys()) )
-        return
-
-    metric = metric_dict[metric_name]
-
-    # EObs must exist
-    # ===============
-    eobs_nc_fnames = glob(form.eobs_dir + '/' + metric + '*0Monthly.nc')
-    if len(eobs_nc_fnames) == 0:
-        print('No EObs file in ' + form.eobs_dir)
+    metric, eobs_nc_fname = _metric_and_eobs_fname(excel_fname, eobs_dir)
+    if metric is None:
         return
 
     csv_fname = csv_fnames[0]
@@ -70,26 +99,254 @@ def convert_csv_file(form):
 
      # read the CSV file
     # ==================
-    data_frame = read_csv(csv_fname, sep = ',', names = csv_headers, skiprows = 1)
+    with timer.stage('read', 0, os.path.getsize(csv_fname)) as stage_rec:
+        data_frame = read_csv(csv_fname, sep = ',', names = csv_headers, skiprows = 1)
+        stage_rec.add(len(data_frame))
 
     # create and write NetCDF file
     # ============================
-    datasets_dir, short_fname = os.path.split(excel_fname)
     root_name = os.path.splitext(short_fname)[0] + '.nc'
     nc_fname_mod = os.path.normpath(os.path.join(datasets_dir, root_name))
     print('Creating ' + nc_fname_mod + '...')
 
-    nc_fname_out = create_netcdf_file(eobs_nc_fnames[0], nc_fname_mod, metric, data_frame, overwrite_flag = True)
+    nc_fname_out = create_netcdf_file(eobs_nc_fname, nc_fname_mod, metric, data_frame, overwrite_flag = True,
+                                window_flag = window_flag, profile = profile, results_fname = results_fname,
+                                                                            resume_flag = resume_flag, timer = timer)
 
     return nc_fname_out
 
-def convert_excel_file(form, overwrite_flag = True):
+def _excel_record_batches(excel_fname, counts, batch_size = excel_batch_size, timer = None):
+    '''
+    generator which reads the first sheet of an Excel file in batches of rows and yields a dictionary of arrays
+    keyed by csv_headers for those rows which pass the checks of convert_excel_file, counts of rejected rows are
+    accumulated in counts; reading and filtering are timed as the read and validate stages of timer
+    '''
+    from openpyxl import load_workbook
+
+    if timer is None:
+        timer = StageTimer(operation = 'excel_record_batches')
+    for key in ['nrows', 'nbad_date', 'nbad_lat_lon', 'nbad_season', 'nbad_seasdif', 'nbad_tg', 'nbad_year']:
+        counts.setdefault(key, 0)
+
+    with timer.stage('read', 0, os.path.getsize(excel_fname)):
+        work_book = load_workbook(excel_fname, read_only=True, data_only=True)
+        sheet = work_book.worksheets[0]
+        rows = sheet.iter_rows(min_row=2, max_col=len(excel_columns), values_only=True)
+    try:
+        while True:
+            with timer.stage('read') as stage_rec:
+                batch = list(islice(rows, batch_size))
+                stage_rec.add(len(batch))
+            if len(batch) == 0:
+                break
+
+            counts['nrows'] += len(batch)
+            with timer.stage('validate', len(batch)):
+                recs = _filter_excel_batch(batch, counts)
+            yield recs
+    finally:
+        work_book.close()
+
+def _filter_excel_batch(batch, counts):
+    '''
+    apply the cell type checks and year filter of convert_excel_file to whole columns of a batch of rows
+    '''
+    cols = {}
+    for col_num, col_name in enumerate(excel_columns):
+        col = np.empty(len(batch), dtype=object)
+        col[:] = [row[col_num] if col_num < len(row) else None for row in batch]
+        cols[col_name] = col
+
+    is_date = np.frompyfunc(lambda val: isinstance(val, datetime), 1, 1)
+    is_number = np.frompyfunc(lambda val: isinstance(val, (int, float)) and not isinstance(val, bool), 1, 1)
+    is_text = np.frompyfunc(lambda val: isinstance(val, str), 1, 1)
+
+    # date and time - Excel serial dates have already been converted by the reader, skip years up to 2000
+    # ===================================================================================================
+    keep = is_date(cols['date_time']).astype(bool)
+    counts['nbad_date'] += int(np.count_nonzero(~keep))
+    dates = np.zeros(len(batch), dtype='datetime64[D]')
+    dates[keep] = cols['date_time'][keep].astype('datetime64[D]')
+    years = dates.astype('datetime64[Y]').astype(int) + 1970
+    keep &= years > 2000
+
+    # lats and longs are numbers, season is text, season difference, tg and year are real numbers
+    # ============================================================================================
+    for col_names, counter, is_type in [(['latitude', 'longitude'], 'nbad_lat_lon', is_number),
+                                        (['season'], 'nbad_season', is_text),
+                                        (['seasdif'], 'nbad_seasdif', is_number),
+                                        (['tg'], 'nbad_tg', is_number),
+                                        (['year'], 'nbad_year', is_number)]:
+        type_ok = np.ones(len(batch), dtype=bool)
+        for col_name in col_names:
+            type_ok &= is_type(cols[col_name]).astype(bool)
+        counts[counter] += int(np.count_nonzero(keep & ~type_ok))
+        keep &= type_ok
+
+    return {'season': cols['season'][keep].astype(float).astype(int),
+            'latitude': cols['latitude'][keep].astype(float64),
+            'longitude': cols['longitude'][keep].astype(float64),
+            'date': dates[keep],
+            'rr_tg': cols['tg'][keep].astype(float64),
+            'seasdif': cols['seasdif'][keep].astype(float64)}
+
+def _xlrd_value(cell, datemode):
+    '''
+    value of an xlrd cell as openpyxl would return it so that both readers are filtered by _filter_excel_batch
+    '''
+    from xlrd import xldate, XL_CELL_TEXT, XL_CELL_NUMBER, XL_CELL_DATE, XL_CELL_BOOLEAN
+
+    if cell.ctype == XL_CELL_DATE:
+        return xldate.xldate_as_datetime(cell.value, datemode)
+    if cell.ctype in (XL_CELL_TEXT, XL_CELL_NUMBER):
+        return cell.value
+    if cell.ctype == XL_CELL_BOOLEAN:
+        return bool(cell.value)
+
+    return None
+
+def _write_csv_recs(csv_writer, recs):
+    '''
+    write filtered records in the order of csv_headers
+    '''
+    csv_writer.writerows(zip(recs['season'], recs['latitude'], recs['longitude'], recs['date'].astype(str),
+                                                                                    recs['rr_tg'], recs['seasdif']))
+
+def _print_bad_counts(counts):
+    '''
+    report rows rejected by _filter_excel_batch
+    '''
+    print('Number of bad dates: {}\tlats/longs: {}\ttgs: {}\tseasons: {}\tseason differences: {}\tyears: {}'
+          .format(counts['nbad_date'], counts['nbad_lat_lon'], counts['nbad_tg'], counts['nbad_season'],
+                                                                        counts['nbad_seasdif'], counts['nbad_year']))
+
+def _stream_excel_to_csv(excel_fname, csv_fname, batch_size = excel_batch_size, timer = None):
+    '''
+    write filtered records to CSV file batch by batch so that memory use is independent of size of Excel file
+    '''
+    try:
+        import openpyxl
+    except ImportError:
+        print('Streaming conversion requires the openpyxl package')
+        return -1
+
+    if timer is None:
+        timer = StageTimer(operation = 'stream_excel_to_csv')
+    print('Streaming Excel file ' + excel_fname + ' in batches of {} rows'.format(batch_size))
+    print('Creating ' + csv_fname + '...')
+    counts = {}
+    nvals = 0
+    with open(csv_fname, 'w', newline='') as fpout:
+        csv_writer = writer(fpout, delimiter=',')
+        csv_writer.writerow(csv_headers)
+        for recs in _excel_record_batches(excel_fname, counts, batch_size, timer):
+            with timer.stage('write', len(recs['season'])):
+                _write_csv_recs(csv_writer, recs)
+            nvals += len(recs['season'])
+            print('have read {} rows and generated {} values'.format(counts['nrows'], nvals))
+        timer.record('write').add(nbytes = fpout.tell())
+
+    print('Identified {} rows of data in Excel file'.format(counts['nrows']))
+    _print_bad_counts(counts)
+
+    return csv_fname
+
+def convert_excel_to_netcdf(form, csv_flag = False, window_flag = True, profile = None, batch_size = excel_batch_size,
+                                                                                                resume_flag = False):
+    '''
+    single pass alternative to convert_excel_file followed by convert_csv_file: each batch of filtered records is
+    spliced into the NetCDF file as it is read from the Excel file so that memory use depends on the batch size
+    csv_flag also writes the filtered records to a CSV file as a side output
+    '''
+    with form_timer(form, 'convert_excel_to_netcdf') as timer:
+        return excel_to_netcdf(form.w_lbl05.text(), form.eobs_dir, csv_flag = csv_flag, window_flag = window_flag,
+                                profile = profile, batch_size = batch_size, resume_flag = resume_flag, timer = timer)
+
+def excel_to_netcdf(excel_fname, eobs_dir, csv_flag = False, window_flag = True, profile = None,
+            batch_size = excel_batch_size, results_fname = results_fname_default, resume_flag = False, timer = None):
+    '''
+    create NetCDF based on EObs data directly from the Excel file - see convert_excel_to_netcdf
+    '''
+    try:
+        import openpyxl
+    except ImportError:
+        print('Conversion of Excel file to NetCDF requires the openpyxl package')
+        return None
+
+    if timer is None:
+        with StageTimer(operation = 'excel_to_netcdf') as timer:
+            return excel_to_netcdf(excel_fname, eobs_dir, csv_flag, window_flag, profile, batch_size, results_fname,
+                                                                                                resume_flag, timer)
+
+    if not os.path.isfile(excel_fname):
+        print('Excel file ' + excel_fname + ' does not exist')
+        return None
+
+    root_fname, exten = os.path.splitext(excel_fname)
+    metric, eobs_nc_fname = _metric_and_eobs_fname(excel_fname, eobs_dir)
+    if metric is None:
+        return None
+
+    # optional side output
+    # ====================
+    fpout = None
+    csv_writer = None
+    if csv_flag:
+        csv_fname = os.path.normpath(root_fname + '_filtered.csv')
+        print('Creating ' + csv_fname + '...')
+        fpout = open(csv_fname, 'w', newline='')
+        csv_writer = writer(fpout, delimiter=',')
+        csv_writer.writerow(csv_headers)
+
+    counts = {}
+    record_batches = _excel_record_batches(excel_fname, counts, batch_size, timer)
+
+    def _frame_batches():
+        """
+        yield the filtered records of each batch as a data frame, writing them to the side output if requested
+        """
+        for recs in record_batches:
+            if csv_writer is not None:
+                with timer.stage('write', len(recs['season'])):
+                    _write_csv_recs(csv_writer, recs)
+            yield DataFrame(recs, columns = csv_headers)
+
+    # stream records from Excel file into NetCDF file
+    # ===============================================
+    nc_fname_mod = os.path.normpath(root_fname + '.nc')
+    print('Streaming Excel file ' + excel_fname + ' in batches of {} rows'.format(batch_size))
+    print('Creating ' + nc_fname_mod + '...')
+    frame_key = {'excel': input_fingerprint(excel_fname), 'batch_size': batch_size}
+    try:
+        nc_fname_out = create_netcdf_file(eobs_nc_fname, nc_fname_mod, metric, _frame_batches(), overwrite_flag = True,
+                                window_flag = window_flag, profile = profile, results_fname = results_fname,
+                                            resume_flag = resume_flag, frame_key = frame_key, timer = timer)
+    finally:
+        record_batches.close()
+        if fpout is not None:
+            timer.record('write').add(nbytes = fpout.tell())
+            fpout.close()
+
+    if len(counts) > 0:
+        print('Identified {} rows of data in Excel file'.format(counts['nrows']))
+        _print_bad_counts(counts)
+
+    return nc_fname_out
+
+def convert_excel_file(form, overwrite_flag = True, stream_flag = False, batch_size = excel_batch_size):
     '''
     read Excel file and write CSV file after filtering out all lines earlier than December 2000
+    stream_flag reads and writes the file in batches of batch_size rows using constant memory
+    return name of the CSV file, None or -1 if it could not be written
+    '''
+    with form_timer(form, 'convert_excel_file') as timer:
+        return _convert_excel_file(form, overwrite_flag, stream_flag, batch_size, timer)
+
+def _convert_excel_file(form, overwrite_flag, stream_flag, batch_size, timer):
+    '''
+    body of convert_excel_file, stages are timed by timer
     '''
 
-    columns = {'A': 'latitude', 'B':  'longitude', 'C': 'date_time', 'D': 'year', 'E': 'season', 'F': 'tg', \
-                                                                                                    'G': 'seasdif'}
     excel_fname = form.w_lbl05.text()
     if not os.path.isfile(excel_fname):
         print('Excel file ' + excel_fname + ' does not exist')
@@ -113,117 +370,137 @@ def convert_excel_file(form, overwrite_flag = True):
             print(csv_fname + ' already exists - cannot continue...')
             return None
 
+    if stream_flag:
+        return _stream_excel_to_csv(excel_fname, csv_fname, batch_size, timer)
+
+    from xlrd import open_workbook
+
     print('Reading Excel file ' + excel_fname + ' - this may take several minutes...')
     try:
-        work_book = open_workbook(excel_fname)
+        with timer.stage('read', 0, os.path.getsize(excel_fname)):
+            work_book = open_workbook(excel_fname)
     except () as err:
         print('Exception {}'.format(err))
         return -1
 
-    # create and write csv file
-    # =========================
-    print('Creating ' + csv_fname + '...')
-    fpout = open(csv_fname, 'w', newline='')
-    csv_writer = writer(fpout, delimiter=',')
-    output = []
-    output.append(csv_headers)
-
-    # print number of sheets and some names
-    nshts = work_book.nsheets
     sheet = work_book.sheet_by_index(0)
-
-    # read column slices - data_set is a dictionary comprising lists of cells
-    # ==================
-    data_set = {}
-    for col_num, col_name in enumerate(columns):
-        # data_set[col_name] = sheet.col_slice(colx = col_num, start_rowx=1, end_rowx=100)
-        data_set[columns[col_name]] = sheet.col_slice(colx = col_num, start_rowx=1)
-
-    nrows = len(data_set['latitude'])
+    nrows = sheet.nrows - 1
     print('Identified {} rows of data in Excel file'.format(nrows))
 
-    # step through each row
-    # identify unique lats and longs, discard rows before and including 2000, otherwise add to output list
-    # =====================
-
-    lat_list = []
-    lon_list = []
-    nbad_tg = 0; nbad_season = 0; nbad_year = 0
-    for rownum in range(nrows):
-
-        # date and time
-        # =============
-        date_time_cell = data_set['date_time'][rownum]
-        if date_time_cell.ctype == 3:
-            excel_date_time = date_time_cell.value
-            # Convert an Excel date/time number into a datetime.datetime o
-            # datemode – 0: 1900-based, 1: 1904-based
-            date_obj = xldate.xldate_as_datetime(excel_date_time, datemode = 0)
-            # skip these years
-            # ================
-            if date_obj.year <= 2000:
+    # filter rows in batches as in the streaming reader and write them with the csv_headers layout
+    # ============================================================================================
+    print('Creating ' + csv_fname + '...')
+    counts = {key: 0 for key in ['nbad_date', 'nbad_lat_lon', 'nbad_season', 'nbad_seasdif', 'nbad_tg', 'nbad_year']}
+    counts['nrows'] = nrows
+    with open(csv_fname, 'w', newline='') as fpout:
+        csv_writer = writer(fpout, delimiter=',')
+        csv_writer.writerow(csv_headers)
+        for strt_row in range(1, sheet.nrows, batch_size):
+            with timer.stage('read') as stage_rec:
+                end_row = min(strt_row + batch_size, sheet.nrows)
+                batch = [[_xlrd_value(cell, work_book.datemode) for cell in sheet.row_slice(rownum, 0,
+                                                            len(excel_columns))] for rownum in range(strt_row, end_row)]
+                stage_rec.add(len(batch))
+            with timer.stage('validate', len(batch)):
+                recs = _filter_excel_batch(batch, counts)
+            with timer.stage('write', len(recs['season'])):
+                _write_csv_recs(csv_writer, recs)
+            timer.progress('validate', strt_row + len(batch) - 1, nrows)
+        timer.record('write').add(nbytes = fpout.tell())
+
+    _print_bad_counts(counts)
+
+    return csv_fname
+
+def _batch_inputs(batch_src):
+    '''
+    return list of Excel files from either a directory or a manifest file listing one Excel file per line
+    '''
+    if os.path.isdir(batch_src):
+        return sorted(glob(os.path.join(batch_src, '*.xlsx')))
+
+    if not os.path.isfile(batch_src):
+        print('Batch source ' + batch_src + ' must be a directory or a manifest file')
+        return []
+
+    manifest_dir = os.path.dirname(batch_src)
+    excel_fnames = []
+    with open(batch_src, 'r') as fmani:
+        for line in fmani:
+            line = line.strip()
+            if line == '' or line.startswith('#'):
                 continue
-        else:
-            print('Bad date time on row {}'.format(rownum))
-            continue
-
-        # lats and longs are numbers
-        # ==========================
-        lat_cell = data_set['latitude'][rownum]
-        if lat_cell.ctype == 2:
-            latitude = lat_cell.value
-            if latitude not in lat_list:
-                lat_list.append(latitude)
-
-        lon_cell = data_set['longitude'][rownum]
-        if lon_cell.ctype == 2:
-            longitude = lon_cell.value
-            if longitude not in lat_list:
-                lon_list.append(longitude)
-
-        # season is text and should be 1, 2, 3 or 4
-        # =========================================
-        season_cell = data_set['season'][rownum]
-        if season_cell.ctype == 1:
-            season = int(season_cell.value)
-        else:
-            nbad_season += 1
+            excel_fnames.append(os.path.normpath(os.path.join(manifest_dir, line)))
 
-        # season difference is real number
-        # ================================
-        seasdif_cell = data_set['seasdif'][rownum]
-        if seasdif_cell.ctype == 2:
-            season_diff = seasdif_cell.value
-        else:
-            print('Bad season difference on row {}'.format(rownum))
-            continue
-
-        # tg is real number
-        # =================
-        tg_cell = data_set['tg'][rownum]
-        if tg_cell.ctype == 2:
-            tg = tg_cell.value
-        else:
-            nbad_tg += 1
-            tg = None
-            continue
-
-        # year is real number
-        year_cell = data_set['year'][rownum]
-        if year_cell.ctype == 2:
-            year_diff = year_cell.value
-        else:
-            nbad_year += 1
-            continue
+    return excel_fnames
 
-        # append
-        output.append([season, date_obj.date(), latitude, longitude, season_diff, tg])
-        nvals = len(output)
-        if int((nvals/1000))*1000 == nvals:
-            print('have generated {} values'.format(nvals))
+def _batch_job(excel_fname, eobs_dir, window_flag, profile, resume_flag = False):
+    '''
+    convert a single Excel file in a worker process - the CSV file saved from the Excel file is used if it exists,
+    otherwise the Excel file is streamed directly
+    '''
+    start_time = time.time()
+    root_fname = os.path.splitext(excel_fname)[0]
+    results_fname = root_fname + '_lat_lons.csv'
+    if os.path.isfile(root_fname + '.csv'):
+        mode = 'csv'
+        nc_fname = csv_to_netcdf(excel_fname, eobs_dir, window_flag = window_flag, profile = profile,
+                                                            results_fname = results_fname, resume_flag = resume_flag)
+    else:
+        mode = 'excel'
+        nc_fname = excel_to_netcdf(excel_fname, eobs_dir, window_flag = window_flag, profile = profile,
+                                                            results_fname = results_fname, resume_flag = resume_flag)
+    if nc_fname is None:
+        status = 'failed'
+    else:
+        status = 'OK'
+
+    return {'excel_fname': excel_fname, 'mode': mode, 'nc_fname': nc_fname, 'status': status,
+                                                                                'elapsed': time.time() - start_time}
+
+def batch_convert(batch_src, eobs_dir, max_workers = None, window_flag = True, profile = None, resume_flag = False):
+    '''
+    convert many Excel/CSV metric files to NetCDF in a pool of processes, each output file being written by
+    its own process; batch_src is a directory of Excel files or a manifest file listing them
+    max_workers defaults to the number of processors, resume_flag completes files left by an interrupted batch
+    '''
+    excel_fnames = _batch_inputs(batch_src)
+    if len(excel_fnames) == 0:
+        print('No Excel files to convert from ' + batch_src)
+        return []
+
+    # jobs with unrecognised metric names are not submitted
+    # =====================================================
+    start_time = time.time()
+    jobs = []
+    futures = {}
+    with ProcessPoolExecutor(max_workers = max_workers) as executor:
+        for excel_fname in excel_fnames:
+            root_fname = os.path.splitext(excel_fname)[0]
+            metric_name = root_fname.split('_')[-1]
+            if metric_name not in metric_dict:
+                jobs.append({'excel_fname': excel_fname, 'mode': None, 'nc_fname': None,
+                             'status': 'skipped - metric ' + metric_name + ' not recognised', 'elapsed': 0.0})
+                continue
 
-    print('Number of bad tgs: {}\tseasons: {}\tyears: {}'.format(nbad_tg, nbad_season, nbad_year))
-    csv_writer.writerows(output)
-    fpout.close()
+            job = {'excel_fname': excel_fname, 'mode': None, 'nc_fname': None, 'status': 'pending', 'elapsed': 0.0}
+            jobs.append(job)
+            futures[executor.submit(_batch_job, excel_fname, eobs_dir, window_flag, profile, resume_flag)] = job
 
-    return
+        for future, job in futures.items():
+            try:
+                job.update(future.result())
+            except Exception as err:
+                job['status'] = 'failed - ' + str(err)
+
+    # summary
+    # =======
+    print('\nBatch conversion of {} files from {} in {:.1f} seconds:'
+                                                    .format(len(jobs), batch_src, time.time() - start_time))
+    for job in jobs:
+        print('\t{:8.1f}s\t{:6}\t{}\t{}'.format(job['elapsed'], str(job['mode']),
+                                                            os.path.basename(job['excel_fname']), job['status']))
+    nok = len([job for job in jobs if job['status'] == 'OK'])
+    print('{} of {} conversions succeeded'.format(nok, len(jobs)))
+
+    return jobs
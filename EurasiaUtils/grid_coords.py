@@ -0,0 +1,68 @@
+#-------------------------------------------------------------------------------
+# Name:        grid_coords.py
+# Purpose:     convert arrays of site coordinates between degrees, granular indices and NetCDF grid indices
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Description: granular indices count cells of size 1/granularity degrees south from 90N and east from 180W, the
+#              default granularity of 120 corresponds to the 30 arc second HWSD grid
+#              NetCDF grid indices count cells north and east from the lower left corner of a bbox of form
+#              [ll_lon, ll_lat, ur_lon, ur_lat]
+#              rounding is half to even, as with Python round, so that results agree with the scalar functions
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'grid_coords.py'
+__version__ = '0.0.0'
+__author__ = 's03mm5'
+
+import numpy as np
+
+granularity = 120   # based on HWSD
+
+def granular_from_lat_lons(lats, lons, granularity = granularity):
+    """
+    return arrays of granular latitude and longitude indices
+    """
+    gran_lats = np.rint((90.0 - np.asarray(lats, dtype=np.float64))*granularity).astype(np.int64)
+    gran_lons = np.rint((180.0 + np.asarray(lons, dtype=np.float64))*granularity).astype(np.int64)
+
+    return gran_lats, gran_lons
+
+def lat_lons_from_granular(gran_lats, gran_lons, granularity = granularity):
+    """
+    return arrays of latitudes and longitudes in degrees
+    """
+    lats = 90.0 - np.asarray(gran_lats, dtype=np.float64)/granularity
+    lons = np.asarray(gran_lons, dtype=np.float64)/granularity - 180.0
+
+    return lats, lons
+
+def nc_indices_from_lat_lons(lats, lons, bbox, granularity = granularity):
+    """
+    return arrays of NetCDF latitude and longitude indices
+    """
+    ll_lon, ll_lat, ur_lon, ur_lat = bbox
+    lat_indxs = np.rint((np.asarray(lats, dtype=np.float64) - ll_lat)*granularity).astype(np.int64)
+    lon_indxs = np.rint((np.asarray(lons, dtype=np.float64) - ll_lon)*granularity).astype(np.int64)
+
+    return lat_indxs, lon_indxs
+
+def nc_indices_from_granular(gran_lats, gran_lons, bbox, granularity = granularity):
+    """
+    return arrays of NetCDF latitude and longitude indices
+    """
+    lats, lons = lat_lons_from_granular(gran_lats, gran_lons, granularity)
+
+    return nc_indices_from_lat_lons(lats, lons, bbox, granularity)
+
+def nc_indices_from_ids(ids, bbox, granularity = granularity):
+    """
+    ids is a sequence or two dimensional array of site IDs, the first two fields of which are granular latitude
+    and longitude e.g. gran_lat, gran_lon, mu_global, fut_clim_scen, soil_num, lu_change
+    """
+    ids = np.asarray(ids)
+    if ids.ndim != 2 or ids.shape[1] < 2:
+        raise ValueError('site IDs must be a sequence of IDs with at least two fields')
+
+    return nc_indices_from_granular(ids[:, 0].astype(np.float64), ids[:, 1].astype(np.float64), bbox, granularity)
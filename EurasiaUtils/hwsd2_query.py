@@ -0,0 +1,373 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        hwsd2_query.py
+# Purpose:     batched queries of HWSD V2 soil mapping unit layers using a pool of reusable connections
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+# Description: the database is either the HWSD V2 Access database, which requires the Microsoft Access ODBC driver,
+#              or a SQLite copy of its tables made once with export_to_sqlite, which can be used where there is no
+#              Access driver e.g. Linux nodes
+#              layer attributes of recently used SMUs are held in columnar form by SmuLayerCache so that repeat
+#              lookups do not go to the database
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'hwsd2_query.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+import time
+import sqlite3
+from queue import Queue, Empty
+from collections import OrderedDict
+from decimal import Decimal
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+ERROR_STR = '*** Error *** '
+MS_SRCH_STR = 'Microsoft Access Driver'
+SQLITE_EXTNS = ['.sqlite', '.sqlite3', '.db']
+SMU_ID = 'HWSD2_SMU_ID'
+LAYERS_TABLE = 'HWSD2_LAYERS'
+LAYER_VARS = ['SEQUENCE', 'SHARE', 'LAYER', 'SAND', 'SILT', 'CLAY', 'BULK', 'REF_BULK', 'ORG_CARBON', 'PH_WATER']
+smu_batch_size = 250        # SMU IDs per IN clause, well within the parameter limits of Access and SQLite
+export_batch_size = 10000   # rows fetched and inserted at a time when exporting
+max_cached_smus = 50000
+
+def _access_driver():
+    """
+    return name of Microsoft Access ODBC driver, None if not installed
+    """
+    from pyodbc import drivers
+
+    drvr_nms = [drvr_nm for drvr_nm in drivers() if drvr_nm.startswith(MS_SRCH_STR)]
+    if len(drvr_nms) == 0:
+        print(ERROR_STR + 'could not find ' + MS_SRCH_STR + ' among ODBC drivers')
+        return None
+
+    return drvr_nms[0]
+
+def _sqlite_value(val):
+    """
+    SQLite has no decimal type
+    """
+    if isinstance(val, Decimal):
+        return float(val)
+
+    return val
+
+def _sqlite_col_type(type_code):
+    """
+    SQLite column affinity for the Python type reported by pyodbc for a column
+    """
+    if type_code in (int, bool):
+        return 'INTEGER'
+    if type_code in (float, Decimal):
+        return 'REAL'
+    if type_code in (bytes, bytearray):
+        return 'BLOB'
+
+    return 'TEXT'
+
+class Hwsd2Query(object):
+    """
+    set based queries of an HWSD V2 database, connections are opened on demand and returned to a pool for reuse
+    """
+    def __init__(self, db_fname, pool_size = 4):
+        """
+        db_fname is either the Access database or a SQLite file made by export_to_sqlite, recognised by its extension
+        """
+        if not os.path.isfile(db_fname):
+            raise FileNotFoundError('HWSD V2 database ' + db_fname + ' does not exist')
+
+        self.db_fname = db_fname
+        self.sqlite_flag = os.path.splitext(db_fname)[1].lower() in SQLITE_EXTNS
+        self.pool_size = pool_size
+        self.pool = Queue()
+        self.nconnections = 0
+        self.nqueries = 0
+        self.query_time = 0.0
+
+        if self.sqlite_flag:
+            self.ms_drvr = None
+        else:
+            self.ms_drvr = _access_driver()
+            if self.ms_drvr is None:
+                raise RuntimeError('no ODBC driver for HWSD V2 Access database ' + db_fname)
+
+    def _connect(self):
+        """
+        open a new connection, SQLite connections are opened read only and may be used by any thread
+        """
+        self.nconnections += 1
+        if self.sqlite_flag:
+            return sqlite3.connect('file:' + self.db_fname + '?mode=ro', uri=True, check_same_thread=False)
+
+        from pyodbc import connect
+
+        return connect(Driver=self.ms_drvr, DBQ=self.db_fname)
+
+    @contextmanager
+    def connection(self):
+        """
+        borrow a connection from the pool, a new one is opened if none is free
+        """
+        try:
+            conn = self.pool.get_nowait()
+        except Empty:
+            conn = self._connect()
+
+        try:
+            yield conn
+        finally:
+            if self.pool.qsize() < self.pool_size:
+                self.pool.put(conn)
+            else:
+                conn.close()
+
+    def close(self):
+        """
+        close all pooled connections
+        """
+        while not self.pool.empty():
+            self.pool.get_nowait().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def tables(self):
+        """
+        return names of tables in the database
+        """
+        with self.connection() as conn:
+            if self.sqlite_flag:
+                cursor = conn.execute("select name from sqlite_master where type = 'table' order by name")
+                table_names = [row[0] for row in cursor.fetchall()]
+            else:
+                cursor = conn.cursor()
+                table_names = [table_info.table_name for table_info in cursor.tables(tableType='TABLE')]
+            cursor.close()
+
+        return table_names
+
+    def columns(self, table_name):
+        """
+        return names of columns of a table
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            if self.sqlite_flag:
+                cursor.execute('select * from ' + table_name + ' limit 0')
+                col_names = [col_desc[0] for col_desc in cursor.description]
+            else:
+                col_names = [row.column_name for row in cursor.columns(table=table_name)]
+            cursor.close()
+
+        return col_names
+
+    def _query_batch(self, table_name, variables, smu_ids):
+        """
+        fetch rows for a batch of SMU IDs with a single parameterised query, the SMU ID is the first column
+        """
+        cmd = 'select {}, {} from {} where {} in ({})'.format(SMU_ID, ', '.join(variables), table_name, SMU_ID,
+                                                                                        ', '.join(['?']*len(smu_ids)))
+        start_time = time.time()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(cmd, smu_ids)
+            rows = [tuple(row) for row in cursor.fetchall()]
+            cursor.close()
+
+        self.nqueries += 1
+        self.query_time += time.time() - start_time
+
+        return rows
+
+    def query_smus(self, smu_ids, table_name = LAYERS_TABLE, variables = None, batch_size = smu_batch_size,
+                                                                                                    max_workers = 1):
+        """
+        return dictionary of lists of rows of variables keyed by SMU ID, SMU IDs without rows are omitted
+        batches of SMU IDs are queried concurrently if max_workers is more than one
+        """
+        if variables is None:
+            variables = LAYER_VARS
+
+        unique_ids = sorted(set(int(smu_id) for smu_id in smu_ids))
+        batches = [unique_ids[indx:indx + batch_size] for indx in range(0, len(unique_ids), batch_size)]
+
+        if max_workers > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers = min(max_workers, self.pool_size)) as executor:
+                batch_rows = list(executor.map(lambda batch: self._query_batch(table_name, variables, batch),
+                                                                                                            batches))
+        else:
+            batch_rows = [self._query_batch(table_name, variables, batch) for batch in batches]
+
+        smu_recs = {}
+        for rows in batch_rows:
+            for row in rows:
+                smu_recs.setdefault(int(row[0]), []).append(row[1:])
+
+        return smu_recs
+
+    def layers_for_smus(self, smu_ids, variables = None, batch_size = smu_batch_size, max_workers = 1):
+        """
+        return layer records of HWSD2_LAYERS for each SMU ID, ordered by sequence and layer if both are requested
+        """
+        if variables is None:
+            variables = LAYER_VARS
+
+        smu_recs = self.query_smus(smu_ids, LAYERS_TABLE, variables, batch_size, max_workers)
+        if 'SEQUENCE' in variables and 'LAYER' in variables:
+            indx_seq, indx_lay = variables.index('SEQUENCE'), variables.index('LAYER')
+            for smu_id in smu_recs:
+                smu_recs[smu_id].sort(key=lambda rec: (-1 if rec[indx_seq] is None else rec[indx_seq],
+                                                                                                str(rec[indx_lay])))
+
+        return smu_recs
+
+def export_to_sqlite(access_db_fn, sqlite_fname, table_names = None, overwrite_flag = False):
+    """
+    copy tables of the HWSD V2 Access database to a SQLite file and index columns of SMU IDs
+    the copy is written to a temporary file which is renamed when complete
+    """
+    if os.path.isfile(sqlite_fname) and not overwrite_flag:
+        print('SQLite copy ' + sqlite_fname + ' already exists')
+        return sqlite_fname
+
+    start_time = time.time()
+    hwsd2 = Hwsd2Query(access_db_fn, pool_size = 1)
+    if table_names is None:
+        table_names = hwsd2.tables()
+
+    tmp_fname = sqlite_fname + '.tmp'
+    if os.path.isfile(tmp_fname):
+        os.remove(tmp_fname)
+
+    sqlite_conn = sqlite3.connect(tmp_fname)
+    with hwsd2.connection() as conn:
+        for table_name in table_names:
+            cursor = conn.cursor()
+            cursor.execute('select * from ' + table_name)
+            col_descs = [(col_desc[0], _sqlite_col_type(col_desc[1])) for col_desc in cursor.description]
+            col_defns = ['"{}" {}'.format(col_name, col_type) for col_name, col_type in col_descs]
+            sqlite_conn.execute('create table {} ({})'.format(table_name, ', '.join(col_defns)))
+
+            insert_cmd = 'insert into {} values ({})'.format(table_name, ', '.join(['?']*len(col_descs)))
+            nrows = 0
+            while True:
+                rows = cursor.fetchmany(export_batch_size)
+                if len(rows) == 0:
+                    break
+                sqlite_conn.executemany(insert_cmd, [[_sqlite_value(val) for val in row] for row in rows])
+                nrows += len(rows)
+            cursor.close()
+
+            col_names = [col_name for col_name, dummy in col_descs]
+            if SMU_ID in col_names:
+                sqlite_conn.execute('create index idx_{0}_{1} on {0} ({1})'.format(table_name, SMU_ID))
+            sqlite_conn.commit()
+            print('Exported {} rows of table {}'.format(nrows, table_name))
+
+    sqlite_conn.close()
+    hwsd2.close()
+    os.replace(tmp_fname, sqlite_fname)
+
+    print('Exported {} tables from {} to {} in {:.1f} seconds'.format(len(table_names), access_db_fn, sqlite_fname,
+                                                                                            time.time() - start_time))
+    return sqlite_fname
+
+class SmuLayerCache(object):
+    """
+    least recently used cache of layer attributes keyed by SMU ID, each entry is a dictionary of tuples of the values
+    of each variable ordered by sequence and layer; SMUs with no layers are cached as empty tuples
+    """
+    def __init__(self, hwsd2, max_smus = max_cached_smus, variables = None, batch_size = smu_batch_size):
+        """
+        hwsd2 is an Hwsd2Query instance
+        """
+        if variables is None:
+            variables = LAYER_VARS
+
+        self.hwsd2 = hwsd2
+        self.max_smus = max_smus
+        self.variables = list(variables)
+        self.batch_size = batch_size
+        self.entries = OrderedDict()
+        self.nhits = 0
+        self.nmisses = 0
+        self.nevictions = 0
+
+    def _store(self, smu_id, recs):
+        """
+        convert rows to columns and add to the cache, evicting least recently used entries if full
+        """
+        columns = {var_name: tuple(rec[indx] for rec in recs) for indx, var_name in enumerate(self.variables)}
+        self.entries[smu_id] = columns
+        while len(self.entries) > self.max_smus:
+            self.entries.popitem(last=False)
+            self.nevictions += 1
+
+        return columns
+
+    def get(self, smu_id):
+        """
+        return columns of layer attributes for a single SMU
+        """
+        return self.get_many([smu_id])[int(smu_id)]
+
+    def get_many(self, smu_ids):
+        """
+        return dictionary of columns of layer attributes keyed by SMU ID, SMUs not cached are fetched together
+        """
+        smu_columns = {}
+        missing_ids = []
+        for smu_id in set(int(smu_id) for smu_id in smu_ids):
+            columns = self.entries.get(smu_id)
+            if columns is None:
+                missing_ids.append(smu_id)
+                self.nmisses += 1
+            else:
+                self.entries.move_to_end(smu_id)
+                smu_columns[smu_id] = columns
+                self.nhits += 1
+
+        if len(missing_ids) > 0:
+            smu_recs = self.hwsd2.layers_for_smus(missing_ids, self.variables, self.batch_size)
+            for smu_id in missing_ids:
+                smu_columns[smu_id] = self._store(smu_id, smu_recs.get(smu_id, []))
+
+        return smu_columns
+
+    def clear(self):
+        """
+        empty the cache, statistics are retained
+        """
+        self.entries.clear()
+
+    def stats(self):
+        """
+        return dictionary of cache statistics
+        """
+        nlookups = self.nhits + self.nmisses
+        if nlookups > 0:
+            hit_rate = self.nhits/nlookups
+        else:
+            hit_rate = 0.0
+
+        return {'size': len(self.entries), 'max_smus': self.max_smus, 'hits': self.nhits, 'misses': self.nmisses,
+                                                            'evictions': self.nevictions, 'hit_rate': hit_rate}
+
+    def report(self):
+        """
+        print cache statistics
+        """
+        stats = self.stats()
+        print('SMU layer cache: {} of {} SMUs\thits: {}\tmisses: {}\tevictions: {}\thit rate: {:.1%}'
+              .format(stats['size'], stats['max_smus'], stats['hits'], stats['misses'], stats['evictions'],
+                                                                                                stats['hit_rate']))
+        return stats
@@ -0,0 +1,77 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        hwsd_points.py
+# Purpose:     look up HWSD V1 mu_globals and soil records for arrays of points e.g. every site of a run file
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+# Description: points are converted to raster indices in one step and read from the memory mapped raster in row
+#              order; soil records are retrieved once for each unique mu_global using HWSD_bil
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'hwsd_points.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import time
+from csv import writer
+
+import numpy as np
+
+from hwsd_raster import HwsdMmap
+
+ERROR_STR = '*** Error *** '
+
+def lookup_point_soils(lggr, hwsd_dir, lats, lons, hwsd = None):
+    """
+    return array of mu_global for each point together with dictionary of soil records keyed by mu_global
+    points with no soil, such as water, have a mu_global of zero and no soil records
+    an existing HwsdMmap may be passed to reuse its raster and soil records
+    """
+    start_time = time.time()
+    if hwsd is None:
+        hwsd = HwsdMmap(lggr, hwsd_dir)
+    mu_globals = hwsd.raster.read_points(lats, lons)
+
+    unique_mus, counts = np.unique(mu_globals[mu_globals > 0], return_counts=True)
+    mu_global_dict = {int(mu_global): int(count) for mu_global, count in zip(unique_mus, counts)}
+    if len(mu_global_dict) == 0:
+        soil_recs = {}
+    else:
+        soil_recs = hwsd.get_soil_recs(mu_global_dict)
+
+    print('Looked up {} points in {:.1f} seconds\tunique mu_globals: {}\tpoints without soil: {}'
+          .format(len(mu_globals), time.time() - start_time, len(mu_global_dict), int((mu_globals <= 0).sum())))
+
+    return mu_globals, soil_recs
+
+def run_file_soils(lggr, hwsd_dir, run_fname, out_fname = None, max_workers = None, cache_flag = False):
+    """
+    look up mu_global and soil records for each site of a run file, optionally write global ID and mu_global of
+    each site to out_fname
+    cache_flag reads sites from the binary cache of the run file, built on first use, otherwise from the run file
+    """
+    from run_file_funcs import open_run_cache, read_run_columns
+
+    run_cache = None
+    if cache_flag:
+        run_cache = open_run_cache(run_fname, max_workers)
+    if run_cache is None:
+        data_frame = read_run_columns(run_fname, ['globalID', 'latitude', 'longitude'], max_workers)
+        global_ids, lats, lons = data_frame['globalID'], data_frame['latitude'].to_numpy(), \
+                                                                                data_frame['longitude'].to_numpy()
+    else:
+        records = run_cache.records
+        global_ids, lats, lons = records['globalID'], records['latitude'], records['longitude']
+
+    mu_globals, soil_recs = lookup_point_soils(lggr, hwsd_dir, lats, lons)
+    if out_fname is not None:
+        with open(out_fname, 'w', newline='') as fobj:
+            csv_writer = writer(fobj)
+            csv_writer.writerow(['globalID', 'mu_global', 'nsoil_recs'])
+            for global_id, mu_global in zip(global_ids, mu_globals):
+                csv_writer.writerow([global_id, mu_global, len(soil_recs.get(int(mu_global), []))])
+        print('Wrote mu_globals of {} sites to {}'.format(len(mu_globals), out_fname))
+
+    return mu_globals, soil_recs
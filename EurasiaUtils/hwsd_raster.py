@@ -0,0 +1,183 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        hwsd_raster.py
+# Purpose:     read only memory map of the HWSD V1 raster of mu_globals
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+# Description: the 43200 x 21600 BIL raster is mapped rather than read so bbox reads are views of the map and only
+#              pages which are touched are read; processes which map the same file share the OS page cache
+#              HwsdMmap offers the methods of HWSD_bil used by this application
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'hwsd_raster.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+
+import numpy as np
+
+from grid_coords import granular_from_lat_lons, granularity
+
+ERROR_STR = '*** Error *** '
+BIL_FNAME = 'hwsd.bil'
+HDR_FNAME = 'hwsd.hdr'
+
+# defaults for the HWSD V1 raster, overridden by the header file if present
+# ========================================================================
+bil_defaults = {'nrows': 21600, 'ncols': 43200, 'nbits': 16, 'byteorder': 'I'}
+
+def read_bil_header(hwsd_dir):
+    """
+    return dictionary of number of rows and columns and numpy data type of the HWSD raster
+    """
+    hdr = dict(bil_defaults)
+    hdr_fname = os.path.join(hwsd_dir, HDR_FNAME)
+    if os.path.isfile(hdr_fname):
+        with open(hdr_fname, 'r') as fhdr:
+            for line in fhdr:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0].lower() in hdr:
+                    key = fields[0].lower()
+                    hdr[key] = fields[1] if key == 'byteorder' else int(fields[1])
+
+    if hdr['byteorder'].upper() == 'M':
+        endian = '>'
+    else:
+        endian = '<'
+    hdr['dtype'] = np.dtype(endian + 'i' + str(hdr['nbits']//8))
+
+    return hdr
+
+def lat_lons_to_indices(lats, lons, nrows = bil_defaults['nrows'], ncols = bil_defaults['ncols'],
+                                                                                        granularity = granularity):
+    """
+    convert arrays of latitudes and longitudes to raster row and column indices, points on the edges of the grid
+    are assigned to the nearest row or column
+    """
+    rows, cols = granular_from_lat_lons(lats, lons, granularity)
+
+    return np.clip(rows, 0, nrows - 1), np.clip(cols, 0, ncols - 1)
+
+class BilRaster(object):
+    """
+    read only memory map of the HWSD raster, when pickled for a worker process the file is mapped afresh
+    """
+    def __init__(self, hwsd_dir):
+        """
+        map hwsd.bil in hwsd_dir
+        """
+        self.hwsd_dir = hwsd_dir
+        self.bil_fname = os.path.join(hwsd_dir, BIL_FNAME)
+        hdr = read_bil_header(hwsd_dir)
+        self.nrows = hdr['nrows']
+        self.ncols = hdr['ncols']
+        self.dtype = hdr['dtype']
+
+        expected_size = self.nrows*self.ncols*self.dtype.itemsize
+        file_size = os.path.getsize(self.bil_fname)
+        if file_size < expected_size:
+            raise ValueError('raster {} has {} bytes, expected {}'.format(self.bil_fname, file_size, expected_size))
+
+        self.grid = np.memmap(self.bil_fname, dtype=self.dtype, mode='r', shape=(self.nrows, self.ncols))
+
+    def __getstate__(self):
+        return {'hwsd_dir': self.hwsd_dir}
+
+    def __setstate__(self, state):
+        self.__init__(state['hwsd_dir'])
+
+    def bbox_indices(self, bbox):
+        """
+        return first and last rows and columns of a bbox of form [ll_lon, ll_lat, ur_lon, ur_lat]
+        """
+        ll_lon, ll_lat, ur_lon, ur_lat = bbox
+        rows, cols = lat_lons_to_indices([ur_lat, ll_lat], [ll_lon, ur_lon], self.nrows, self.ncols)
+
+        return int(rows[0]), int(rows[1]), int(cols[0]), int(cols[1])
+
+    def read_bbox(self, bbox):
+        """
+        return view of the raster covering bbox, rows are ordered from north to south
+        """
+        row_frst, row_last, col_frst, col_last = self.bbox_indices(bbox)
+
+        return self.grid[row_frst:row_last + 1, col_frst:col_last + 1]
+
+    def read_point(self, lat, lon):
+        """
+        return raster value at a point
+        """
+        rows, cols = lat_lons_to_indices([lat], [lon], self.nrows, self.ncols)
+
+        return int(self.grid[rows[0], cols[0]])
+
+    def read_points(self, lats, lons):
+        """
+        return array of raster values for arrays of latitudes and longitudes, points are read in row order
+        """
+        rows, cols = lat_lons_to_indices(lats, lons, self.nrows, self.ncols)
+        values = np.zeros(len(rows), dtype=self.dtype)
+        order = np.lexsort((cols, rows))
+        values[order] = self.grid[rows[order], cols[order]]
+
+        return values
+
+class HwsdMmap(object):
+    """
+    stands in for HWSD_bil using the memory mapped raster, soil records are retrieved by HWSD_bil
+    """
+    def __init__(self, lggr, hwsd_dir, raster = None):
+        """
+        an existing BilRaster may be shared between instances
+        """
+        self.lggr = lggr
+        self.hwsd_dir = hwsd_dir
+        if raster is None:
+            raster = BilRaster(hwsd_dir)
+        self.raster = raster
+        self.hwsd_bil = None
+        self.mu_global_grid = None
+        self.nlats = 0
+        self.nlons = 0
+
+    def read_bbox_mu_globals(self, bbox, snglPntFlag = False):
+        """
+        bbox is [ll_lon, ll_lat, ur_lon, ur_lat] or, if snglPntFlag is set, [lon, lat]
+        return number of raster values read
+        """
+        if snglPntFlag:
+            lon, lat = bbox[:2]
+            bbox = [lon, lat, lon, lat]
+
+        self.mu_global_grid = self.raster.read_bbox(bbox)
+        self.nlats, self.nlons = self.mu_global_grid.shape
+
+        return self.mu_global_grid.size
+
+    def get_mu_globals_dict(self):
+        """
+        return dictionary of number of cells of each mu_global in the last bbox read, None if there is no soil
+        """
+        if self.mu_global_grid is None:
+            return None
+
+        unique_mus, counts = np.unique(self.mu_global_grid, return_counts=True)
+        mu_globals = {int(mu_global): int(count) for mu_global, count in zip(unique_mus, counts) if mu_global > 0}
+        if len(mu_globals) == 0:
+            return None
+
+        return mu_globals
+
+    def get_soil_recs(self, mu_globals):
+        """
+        return soil records for each mu_global using HWSD_bil, which is created on first use
+        """
+        if self.hwsd_bil is None:
+            from hwsd_bil import HWSD_bil
+
+            self.hwsd_bil = HWSD_bil(self.lggr, self.hwsd_dir)
+
+        return self.hwsd_bil.get_soil_recs(mu_globals)
@@ -14,7 +14,7 @@ __version__ = '0.0.0'
 # Version history
 # ---------------
 # 
-from os.path import isdir, join, exists, isfile, normpath
+from os.path import isdir, join, exists, normpath
 from os import makedirs, getcwd
 from json import load as json_load, dump as json_dump
 from time import sleep
@@ -24,7 +24,9 @@ from set_up_logging import set_up_logging
 sleepTime = 5
 APPLIC_STR = 'eurasia_utils'
 ERROR_STR = '*** Error *** '
-STTNGS_LIST = ['fname_png', 'results_dir', 'root_dir', 'glec_data_dir', 'shp_dir', 'new_shp_dir', 'log_dir', 'hwsd_dir']
+STTNGS_LIST = ['fname_png', 'results_dir', 'root_dir', 'glec_data_dir', 'shp_dir', 'new_shp_dir', 'log_dir', 'hwsd_dir',
+                                                                                            'sims_dir', 'mirror_dir']
+STTNGS_OPTIONAL = ['stacks_fname', 'run_cache']  # sampling profiler of stage_timer and binary cache of the run file
 
 def initiation(form):
     """
@@ -59,7 +61,7 @@ def _read_setup_file(form, gui_flag=False):
         settings = _write_default_setup_file(setup_file)
 
     for key in settings:
-        if key not in STTNGS_LIST:
+        if key not in STTNGS_LIST + STTNGS_OPTIONAL:
             print(ERROR_STR + 'attribute {} required in settings file {}'.format(key, setup_file))
             sleep(sleepTime)
             exit(0)
@@ -71,14 +73,6 @@ def _read_setup_file(form, gui_flag=False):
     settings['country_codes'] = settings['root_dir'] + '\\Country_codes'
     settings['country_zips'] = settings['root_dir'] + '\\Country_zips'
 
-    # zipper
-    decompressor = 'C:\\Program Files\\7-Zip\\7z.exe'
-    if isfile(decompressor):
-        form.decompressor = decompressor
-    else:
-        print('Decompression executable ' + decompressor + ' must exist')
-        return False
-
     settings['excel_fname'] = ''
     settings['setup_file'] = setup_file
     glec_data_dir = ''
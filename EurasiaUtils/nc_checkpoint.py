@@ -0,0 +1,86 @@
+#-------------------------------------------------------------------------------
+# Name:        nc_checkpoint.py
+# Purpose:     sidecar checkpoint files which allow generation of a NetCDF file to resume after a failure
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Description: the checkpoint of file.nc is file.nc.ckpt.json and consists of a key identifying the inputs and
+#              settings of the run, whether the file has been defined and the units of work committed so far
+#              the NetCDF file is synced before each checkpoint is written so that the checkpoint never records
+#              more than is on disk
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'nc_checkpoint.py'
+__version__ = '0.0.0'
+__author__ = 's03mm5'
+
+import os
+from json import load as json_load
+
+from sbs_misc_utils import write_json_atomic
+
+CKPT_SUFFIX = '.ckpt.json'
+CKPT_VERSION = 1
+
+def checkpoint_fname(nc_fname):
+    """
+    name of the checkpoint of a NetCDF file
+    """
+    return nc_fname + CKPT_SUFFIX
+
+def input_fingerprint(fname):
+    """
+    name, size and modification time of an input file
+    """
+    fstat = os.stat(fname)
+
+    return {'fname': os.path.abspath(fname), 'size': fstat.st_size, 'mtime_ns': fstat.st_mtime_ns}
+
+def new_checkpoint(key):
+    """
+    return checkpoint for a run identified by key, a dictionary of values which must match for a run to resume
+    """
+    return {'version': CKPT_VERSION, 'key': key, 'defined': False, 'done': {}}
+
+def read_checkpoint(nc_fname, key = None):
+    """
+    return checkpoint of nc_fname if it exists and was written by a run with the same key, otherwise None
+    if key is None the checkpoint is returned whatever its key
+    """
+    ckpt_fname = checkpoint_fname(nc_fname)
+    if not os.path.isfile(ckpt_fname):
+        return None
+
+    try:
+        with open(ckpt_fname, 'r') as fckpt:
+            ckpt = json_load(fckpt)
+    except (OSError, ValueError) as err:
+        print('Could not read checkpoint {} - will start afresh: {}'.format(ckpt_fname, err))
+        return None
+
+    if ckpt.get('version') != CKPT_VERSION or (key is not None and ckpt.get('key') != key):
+        print('Checkpoint ' + ckpt_fname + ' was written by a run with different inputs - will start afresh')
+        return None
+
+    return ckpt
+
+def commit_checkpoint(nc_obj, nc_fname, ckpt):
+    """
+    sync the NetCDF file, if open, then write the checkpoint to a temporary file and rename it
+    """
+    if nc_obj is not None:
+        nc_obj.sync()
+    write_json_atomic(checkpoint_fname(nc_fname), ckpt)
+
+    return
+
+def remove_checkpoint(nc_fname):
+    """
+    remove checkpoint once the NetCDF file is complete
+    """
+    ckpt_fname = checkpoint_fname(nc_fname)
+    if os.path.isfile(ckpt_fname):
+        os.remove(ckpt_fname)
+
+    return
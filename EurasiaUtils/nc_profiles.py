@@ -0,0 +1,112 @@
+#-------------------------------------------------------------------------------
+# Name:        nc_profiles.py
+# Purpose:     output profiles which set chunk shapes, compression and chunk cache sizes of NetCDF4 variables
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Description: a profile is chosen to suit the access pattern of the file:
+#                   cell_series - complete time series of a small block of cells, as written by writeNC_set
+#                   map_slice   - complete lat/lon map for a single time step
+#                   archive     - maximum compression, moderate chunks, for files which are rarely read
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'nc_profiles.py'
+__version__ = '0.0.0'
+__author__ = 's03mm5'
+
+import os
+import numpy as np
+
+ERROR_STR = '*** Error *** '
+MB = 1024*1024
+
+# chunk length for each dimension role, None signifies the full length of the dimension
+# ======================================================================================
+output_profiles = {
+    'cell_series': {'chunks': {'time': None, 'lat': 8, 'lon': 8}, 'zlib': True, 'complevel': 1, 'shuffle': True,
+                    'cache_size': 32*MB, 'cache_nelems': 2003, 'cache_preemption': 0.75},
+    'map_slice': {'chunks': {'time': 1, 'lat': None, 'lon': None}, 'zlib': True, 'complevel': 1, 'shuffle': True,
+                    'cache_size': 16*MB, 'cache_nelems': 1009, 'cache_preemption': 0.75},
+    'archive': {'chunks': {'time': 12, 'lat': 64, 'lon': 64}, 'zlib': True, 'complevel': 9, 'shuffle': True,
+                    'cache_size': 4*MB, 'cache_nelems': 521, 'cache_preemption': 0.75}
+}
+
+dim_roles = {'time': 'time', 'lat': 'lat', 'latitude': 'lat', 'lon': 'lon', 'longitude': 'lon'}
+
+def check_profile(profile):
+    """
+    return True if profile is recognised, None denotes the default contiguous, uncompressed layout
+    """
+    if profile is None or profile in output_profiles:
+        return True
+
+    print(ERROR_STR + 'output profile ' + str(profile) + ' not recognised - must be one of '
+                                                                                + str(list(output_profiles.keys())))
+    return False
+
+def profile_var_kwargs(profile, var_dims, dim_sizes):
+    """
+    return keyword arguments for createVariable for a variable with dimensions var_dims
+    dim_sizes is a dictionary of dimension lengths
+    """
+    if profile is None:
+        return {}
+
+    prof = output_profiles[profile]
+    chunksizes = []
+    for dname in var_dims:
+        len_dim = max(1, dim_sizes[dname])
+        chunk_len = prof['chunks'].get(dim_roles.get(dname))
+        if chunk_len is None:
+            chunksizes.append(len_dim)
+        else:
+            chunksizes.append(min(chunk_len, len_dim))
+
+    kwargs = {'zlib': prof['zlib'], 'complevel': prof['complevel'], 'shuffle': prof['shuffle']}
+    if len(chunksizes) > 0:
+        kwargs['chunksizes'] = chunksizes
+
+    return kwargs
+
+def set_profile_cache(nc_var, profile):
+    """
+    set chunk cache of a variable to suit the profile
+    """
+    if profile is None:
+        return
+
+    prof = output_profiles[profile]
+    nc_var.set_var_chunk_cache(size=prof['cache_size'], nelems=prof['cache_nelems'],
+                                                                            preemption=prof['cache_preemption'])
+    return
+
+def dataset_nbytes(nc_obj):
+    """
+    return uncompressed size in bytes of all numeric variables in an open dataset
+    """
+    nbytes = 0
+    for nc_var in nc_obj.variables.values():
+        if isinstance(nc_var.dtype, np.dtype):
+            nbytes += int(np.prod(nc_var.shape))*nc_var.dtype.itemsize
+
+    return nbytes
+
+def report_profile(profile, nc_fname, nbytes_written, elapsed):
+    """
+    report resulting file size and write throughput for the profile used to write nc_fname
+    """
+    file_size = os.path.getsize(nc_fname)
+    if elapsed > 0:
+        throughput = nbytes_written/MB/elapsed
+    else:
+        throughput = 0.0
+
+    if profile is None:
+        profile = 'default'
+
+    print('Profile {}: wrote {:.1f} MB to {} in {:.2f} seconds\tfile size: {:.1f} MB\tthroughput: {:.1f} MB/s'
+          .format(profile, nbytes_written/MB, nc_fname, elapsed, file_size/MB, throughput))
+
+    return {'profile': profile, 'nc_fname': nc_fname, 'nbytes_written': nbytes_written, 'file_size': file_size,
+                                                                    'elapsed': elapsed, 'throughput': throughput}
@@ -14,29 +14,43 @@ __version__ = '0.0.0'
 __author__ = 's03mm5'
 
 import os
-import sys
 from time import time
 import netCDF4 as cdf
 from datetime import datetime
 import numpy as np
+from hashlib import sha1
+from pandas.api.types import is_datetime64_any_dtype
+from pandas.util import hash_pandas_object
 from csv import writer
+from pandas import DataFrame
 
+from nc_profiles import check_profile, profile_var_kwargs, set_profile_cache, dataset_nbytes, report_profile
+from grid_coords import nc_indices_from_granular
+from nc_checkpoint import (checkpoint_fname, input_fingerprint, new_checkpoint, read_checkpoint, commit_checkpoint,
+                                                                                                remove_checkpoint)
+from stage_timer import StageTimer
+
+ERROR_STR = '*** Error *** '
 missing_value = -999.0
-sleepTime = 3.5
 granularity = 120   # based on HWSD
+max_slab_bytes = 64*1024*1024    # upper bound on memory used when copying variables in window mode
+results_fname_default = 'E:\\temp\\results.csv'    # lat/longs of spliced cells
 
-def getNC_coords(id_, bbox, granularity):
-
-    ll_lon, ll_lat, ur_lon, ur_lat = bbox
-    gran_lat, gran_lon, mu_global, fut_clim_scen, soil_num, lu_change = id_
+season_months = {1:[12,1,2], 2:[3,4,5], 3:[6,7,8], 4:[9,10,11] }
 
-    laty = 90.0 - (float(gran_lat)/granularity)
-    lonx = (float(gran_lon)/granularity) - 180.0
+# lookup of position of month within season, indexed by [season, month], -1 where month not in season
+# ==================================================================================================
+month_sub_indices = np.full((5, 13), -1, dtype=int)
+for _season, _months in season_months.items():
+    month_sub_indices[_season, _months] = range(len(_months))
 
-    lat_indx = round((laty - ll_lat)*granularity)
-    lon_indx = round((lonx - ll_lon)*granularity)
+def getNC_coords(id_, bbox, granularity):
+    """
+    return NetCDF latitude and longitude indices of a single site - for many sites use nc_indices_from_ids
+    """
+    lat_indxs, lon_indxs = nc_indices_from_granular([float(id_[0])], [float(id_[1])], bbox, granularity)
 
-    return list([lat_indx, lon_indx])
+    return list([int(lat_indxs[0]), int(lon_indxs[0])])
 
 def writeNC_set(var_name, ncfile, lat_indx, lon_indx, res):
 
@@ -47,120 +61,72 @@ def writeNC_set(var_name, ncfile, lat_indx, lon_indx, res):
 
     return
 
-def create_netcdf_file(nc_fname_inp, nc_fname_out, metric, data_frame, overwrite_flag):
+def _record_months(data_frame):
     """
-    create a new NC weather file based on EObs - overwrite starting from December 2000
+    return month of each record as an integer array - dates are either datetimes or strings of form dd/mm/yyyy
+    or yyyy-mm-dd
     """
-    func_name =  __prog__ + ' create_netcdf_file'
+    dates = data_frame['date']
+    if is_datetime64_any_dtype(dates):
+        return dates.dt.month.to_numpy()
 
-    season_months = {1:[12,1,2], 2:[3,4,5], 3:[6,7,8], 4:[9,10,11] }
-    permitted_seasons = season_months.keys()
-
-    # identify patch
-    # ==============
-    lat_max = data_frame['latitude'].max()
-    lat_min = data_frame['latitude'].min()
-    lon_max = data_frame['longitude'].max()
-    lon_min = data_frame['longitude'].min()
-
-    # construct new file name for weather
-    # ===================================
-    if os.path.isfile(nc_fname_out):
-        if overwrite_flag:
-            try:
-                os.remove(nc_fname_out)
-                print('Deleted: ' + nc_fname_out)
-            except PermissionError as e:
-                print(str(e) + ' -could not delete: ' + nc_fname_out)
-                return None
-        else:
-            print(nc_fname_out + ' already exists - cannot continue...')
-            return None
+    return dates.astype(str).str.split('[/-]').str[1].astype(int).to_numpy()
 
-    print('\nOpening the ' + metric + ' output NetCDF file ' + nc_fname_out)
-    nc_obj_out = cdf.Dataset(nc_fname_out,'w', format='NETCDF4')        # create netCDF4 dataset object
-
-    # output NC file is modelled on EObs
-    # ==================================
-    print('Opening the ' + metric + ' input NetCDF file ' + nc_fname_inp)
-    nc_obj_inp = cdf.Dataset(nc_fname_inp,'r', format='NETCDF4')
-
-    date_str = '31/12/2000'
-    day, month, year = date_str.split('/')
-    date_obj = datetime(int(year), int(month), int(day), 0, 0)      # TODO: tidy up
-    time_var = nc_obj_inp.variables['time']
-    date_indx_31_12_2000 = cdf.date2index(date_obj, time_var)
-
-    # copy attributes
-    # ===============
-    for attr_name in nc_obj_inp.ncattrs():
-        nc_obj_out.setncatts({attr_name: nc_obj_inp.getncattr(attr_name)})
-
-    print('Copied attributes ')
-
-    # copy dimensions - lat, long and time
-    # ====================================
-    for dname in nc_obj_inp.dimensions:
-        len_dim = len(nc_obj_inp.dimensions[dname])
-        nc_obj_out.createDimension(dname, len_dim)
-
-    print('Created dimensions')
-
-    # copy variables
-    # ==============
-    for variable in nc_obj_inp.variables:
-
-        if variable == metric:
-            continue
-
-        print('\tProcessing var: ' + variable)
-        varin = nc_obj_inp.variables[variable]
-        var_dims = varin.dimensions
-        outVar = nc_obj_out.createVariable(variable, varin.datatype, var_dims)
+def _date_month(date_val):
+    """
+    return month of a single record date, see _record_months
+    """
+    if isinstance(date_val, str):
+        day, month, year = date_val.replace('-', '/').split('/')
+        return int(month)
 
-        # copy variable attributes
-        # ========================
-        for attr_name in varin.ncattrs():
-            outVar.setncatts({attr_name: varin.getncattr(attr_name)})
+    return date_val.month
 
+def _copy_variable_in_slabs(varin, outVar, strt_indx = 0, slab_done = None):
+    """
+    copy variable, or array, along its first dimension in slabs of no more than max_slab_bytes starting at strt_indx
+    slab_done, if given, is called with the index of the next slab after each slab is copied
+    """
+    if len(varin.shape) == 0 or not isinstance(varin.dtype, np.dtype):
         outVar[:] = varin[:]
+        if slab_done is not None:
+            slab_done(1)
+        return
+
+    nrecs = varin.shape[0]
+    rec_bytes = varin.dtype.itemsize*int(np.prod(varin.shape[1:]))
+    nstep = max(1, max_slab_bytes//max(1, rec_bytes))
+    for indx in range(strt_indx, nrecs, nstep):
+        outVar[indx:indx + nstep] = varin[indx:indx + nstep]
+        if slab_done is not None:
+            slab_done(min(indx + nstep, nrecs))
 
-    # identify patch
-    # ==============
-    lats = nc_obj_out.variables['latitude']
-    lons = nc_obj_out.variables['longitude']
-    resol = lats[1] - lats[0]
-    lat_indx1 = int((lat_min - lats[0])/resol)
-    lat_indx2 = int((lat_max - lats[0])/resol)
-    lon_indx1 = int((lon_min - lons[0])/resol)
-    lon_indx2 = int((lon_max - lons[0])/resol)
-    print('Will replace patch with lat indices: {} {}\tlong indices: {} {}'\
-                                                            .format(lat_indx1, lat_indx2, lon_indx1, lon_indx2))
-    # copy metric variable
-    # ====================
-    print('\tProcessing var: ' + metric)
-    varin = nc_obj_inp.variables[metric]
-    var_dims = varin.dimensions
-    outVar = nc_obj_out.createVariable(metric, varin.datatype, var_dims)
+    return
 
-    # copy variable attributes
-    # ========================
-    for attr_name in varin.ncattrs():
-        outVar.setncatts({attr_name: varin.getncattr(attr_name)})
+def _frame_digest(data_frame):
+    """
+    digest of the contents of a data frame
+    """
+    return sha1(hash_pandas_object(data_frame, index=True).to_numpy().tobytes()).hexdigest()
 
-    # edit metric variable with data frame records
-    # ============================================
-    trans_var = varin[:, :, :]
+def _splice_records_by_row(trans_var, data_frame, lat0, lon0, resol, date_indx_strt, origin = (0, 0, 0),
+                                                                                                    timer = None):
+    """
+    splice data frame records into trans_var one record at a time - retained as a debug fallback
+    origin is the time, lat, lon index of the first element of trans_var
+    progress is logged by timer, if given, under the splice stage
+    """
+    time_orig, lat_orig, lon_orig = origin
+    permitted_seasons = season_months.keys()
     lat_long_pairs = []
 
     # start date for beginning of data editing - this will be incremented by 3 as season changes
     # ========================================
-    date_curr_indx = date_indx_31_12_2000
+    date_curr_indx = date_indx_strt
     num_recs = len(data_frame.values)
     last_season = None
     nspliced = 0
     save_flag = True
-    last_time = time()
     for ic, record in enumerate(data_frame.values):
         season, latitude, longitude, date_str, rr_tg, season_diff = record
         if last_season == None:
@@ -186,8 +152,7 @@ def create_netcdf_file(nc_fname_inp, nc_fname_out, metric, data_frame, overwrite
 
         # validate month
         # ==============
-        day, month, year = date_str.split('/')
-        month = int(month)
+        month = _date_month(date_str)
         if month not in valid_months:
             print('Month {} not in valid months {} for season error in record {}: {}'
                   .format(month, valid_months, ic, record))
@@ -196,36 +161,405 @@ def create_netcdf_file(nc_fname_inp, nc_fname_out, metric, data_frame, overwrite
 
         date_sub_indx = valid_months.index(month)
 
-        lat_indx = int((latitude - lats[0])/resol)
-        lon_indx = int((longitude - lons[0])/resol)
+        lat_indx = int((latitude - lat0)/resol)
+        lon_indx = int((longitude - lon0)/resol)
         lat_long_pair = [lat_indx, lon_indx]
         if lat_long_pair not in lat_long_pairs:
             lat_long_pairs.append(lat_long_pair)
 
         try:
-            trans_var[date_curr_indx + date_sub_indx, lat_indx, lon_indx] = rr_tg
+            trans_var[date_curr_indx + date_sub_indx - time_orig, lat_indx - lat_orig, lon_indx - lon_orig] = rr_tg
             nspliced += 1
         except(IndexError) as e:
             print(e)
             save_flag = False
             break
 
+        if timer is not None:
+            timer.progress('splice', nspliced, num_recs)
 
-        this_time = time()
-        if (this_time - last_time) > sleepTime:
-            sys.stdout.flush()
-            sys.stdout.write('\rhave spliced {} values, number remaining: {}'.format(nspliced, num_recs - nspliced))
-            last_time = this_time
+    return nspliced, date_curr_indx, lat_long_pairs, save_flag
+
+def _splice_records_vectorised(trans_var, data_frame, lat0, lon0, resol, date_indx_strt, origin = (0, 0, 0),
+                                                                                                    timer = None):
+    """
+    splice data frame records into trans_var using a single fancy-indexed assignment
+    produces the same result as _splice_records_by_row
+    validation and the assignment are timed as the validate and splice stages of timer, if given
+    """
+    if timer is None:
+        timer = StageTimer(operation = 'splice')
+    time_orig, lat_orig, lon_orig = origin
+    num_recs = len(data_frame)
+    if num_recs == 0:
+        return 0, date_indx_strt, [], True
+
+    with timer.stage('validate', num_recs):
+        seasons = data_frame['season'].to_numpy()
+        rr_tgs = data_frame['rr_tg'].to_numpy()
+
+        # validate seasons and months with masks
+        # ======================================
+        season_ok = np.isin(seasons, list(season_months.keys()))
+        bad_indxs = np.flatnonzero(~season_ok)
+        if len(bad_indxs) > 0:
+            nbad_season = bad_indxs[0]
+        else:
+            nbad_season = num_recs
+
+        # months before the first bad season are parsed so the same first error is reported as the per-row path
+        # ======================================================================================================
+        months = _record_months(data_frame.iloc[:nbad_season])
+        season_nums = seasons[:nbad_season].astype(int)
+
+        # months outside 1 to 12 are not looked up so that they are reported as bad records rather than raising
+        # =====================================================================================================
+        month_ok = (months >= 1) & (months <= 12)
+        date_sub_indxs = np.full(len(months), -1, dtype=int)
+        date_sub_indxs[month_ok] = month_sub_indices[season_nums[month_ok], months[month_ok]]
+        bad_indxs = np.flatnonzero(date_sub_indxs < 0)
+        if len(bad_indxs) > 0:
+            ic = bad_indxs[0]
+            valid_months = season_months[season_nums[ic]]
+            print('Month {} not in valid months {} for season error in record {}: {}'
+                  .format(months[ic], valid_months, ic, data_frame.values[ic]))
+            return 0, date_indx_strt, [], False
+
+        if nbad_season < num_recs:
+            print('Season error in record {}: {}'.format(nbad_season, data_frame.values[nbad_season]))
+            return 0, date_indx_strt, [], False
+
+    with timer.stage('splice', num_recs):
+        # time index is incremented by 3 each time the season changes from one record to the next
+        # ========================================================================================
+        season_changes = np.concatenate(([0], np.cumsum(seasons[1:] != seasons[:-1])))
+        time_indxs = date_indx_strt + 3*season_changes + date_sub_indxs
+
+        lat_indxs = ((data_frame['latitude'].to_numpy(dtype=np.float64) - lat0)/resol).astype(int)
+        lon_indxs = ((data_frame['longitude'].to_numpy(dtype=np.float64) - lon0)/resol).astype(int)
+
+        try:
+            trans_var[time_indxs - time_orig, lat_indxs - lat_orig, lon_indxs - lon_orig] = rr_tgs
+        except(IndexError) as e:
+            print(e)
+            return 0, date_indx_strt, [], False
+
+    # unique lat/long pairs in order of first appearance
+    # ==================================================
+    pairs, first_indxs = np.unique(np.stack((lat_indxs, lon_indxs), axis=1), axis=0, return_index=True)
+    lat_long_pairs = pairs[np.argsort(first_indxs)].tolist()
+
+    date_curr_indx = date_indx_strt + 3*int(season_changes[-1])
+
+    return num_recs, date_curr_indx, lat_long_pairs, True
+
+def _splice_batches(outVar, frame_batches, lat0, lon0, resol, date_indx_strt, nbatches_done = 0, batch_done = None,
+                                                                                                    timer = None):
+    """
+    splice an iterator of data frames into outVar, which already holds a copy of the input variable, as each data
+    frame is produced: the window of outVar spanned by a batch is read, spliced and written back so that memory use
+    depends on the size of a batch rather than on the number of records
+    the season carries over from one batch to the next so that time indices are those of a single data frame
+    the first nbatches_done batches, spliced by an interrupted run, are scanned but not spliced again
+    batch_done, if given, is called with the number of batches spliced after each batch is written
+    return numbers of values spliced and records read, the last time index, lat/long pairs and success flag
+    """
+    if timer is None:
+        timer = StageTimer(operation = 'splice')
+    date_curr_indx = date_indx_strt
+    last_season = None
+    lat_long_pairs = {}     # keys in order of first appearance
+    nspliced = 0
+    num_recs = 0
+    for batch_num, batch in enumerate(frame_batches):
+        num_recs += len(batch)
+        if len(batch) == 0:
+            continue
+
+        # time index is incremented by 3 if the season changes from the last record of the previous batch
+        # ================================================================================================
+        seasons = batch['season'].to_numpy()
+        if last_season is not None and seasons[0] != last_season:
+            date_curr_indx += 3
+        last_season = seasons[-1]
+        nseason_changes = int(np.count_nonzero(seasons[1:] != seasons[:-1]))
+
+        lat_indxs = ((batch['latitude'].to_numpy(dtype=np.float64) - lat0)/resol).astype(int)
+        lon_indxs = ((batch['longitude'].to_numpy(dtype=np.float64) - lon0)/resol).astype(int)
+        lat_long_pairs.update(dict.fromkeys(zip(lat_indxs.tolist(), lon_indxs.tolist())))
+
+        if batch_num < nbatches_done:
+            date_curr_indx += 3*nseason_changes
+            continue
+
+        # window spanned by batch, the last season extends 2 months beyond its time index
+        # ================================================================================
+        lat_indx_lo, lon_indx_lo = int(lat_indxs.min()), int(lon_indxs.min())
+        if min(lat_indx_lo, lon_indx_lo) < 0:
+            print('Records of batch {} lie outside the grid'.format(batch_num))
+            return nspliced, num_recs, date_curr_indx, [list(pair) for pair in lat_long_pairs], False
+
+        window = (slice(date_curr_indx, date_curr_indx + 3*nseason_changes + 3),
+                    slice(lat_indx_lo, int(lat_indxs.max()) + 1), slice(lon_indx_lo, int(lon_indxs.max()) + 1))
+        origin = (date_curr_indx, lat_indx_lo, lon_indx_lo)
+        with timer.stage('read') as stage_rec:
+            trans_var = outVar[window]
+            stage_rec.add(trans_var.shape[0], trans_var.nbytes)
+
+        nvals, date_curr_indx, dummy, save_flag = _splice_records_vectorised(trans_var, batch, lat0, lon0, resol,
+                                                                                    date_curr_indx, origin, timer)
+        if not save_flag:
+            print('Records of batch {} could not be spliced'.format(batch_num))
+            return nspliced, num_recs, date_curr_indx, [list(pair) for pair in lat_long_pairs], False
+
+        with timer.stage('write', trans_var.shape[0], trans_var.nbytes):
+            outVar[window] = trans_var
+        nspliced += nvals
+        if batch_done is not None:
+            batch_done(batch_num + 1)
+
+    if num_recs == 0:
+        print('No records to splice')
+        return 0, 0, date_curr_indx, [], False
+
+    return nspliced, num_recs, date_curr_indx, [list(pair) for pair in lat_long_pairs], True
+
+def create_netcdf_file(nc_fname_inp, nc_fname_out, metric, data_frame, overwrite_flag, vector_flag = True,
+                    window_flag = False, profile = None, results_fname = results_fname_default, resume_flag = False,
+                                                                                    frame_key = None, timer = None):
+    """
+    create a new NC weather file based on EObs - overwrite starting from December 2000
+    data_frame is either a data frame of records or an iterator of data frames which are spliced as they are
+    produced, each into the window of the metric variable which it spans, see _splice_batches
+    vector_flag selects the array-based splice, otherwise records are spliced one at a time
+    window_flag copies variables in bounded slabs and only reads and rewrites the patch from December 2000 onwards
+    profile is one of the output profiles in nc_profiles, None retains the layout of NetCDF library defaults
+    results_fname is the CSV file to which the spliced lat/longs are written, None to skip
+    resume_flag copies variables in slabs recording each slab in a checkpoint, if a checkpoint from an interrupted
+    run with the same inputs exists the output file is reopened and completed
+    frame_key identifies the records in the checkpoint in place of a digest of the data frame, it is required to
+    resume from an iterator of data frames
+    timer is the StageTimer of the calling operation, if None the stages are timed and logged by this function
+    return name of the output file, None if it could not be created or the records could not be spliced
+    """
+    if timer is None:
+        with StageTimer(operation = 'create_netcdf_file') as timer:
+            return create_netcdf_file(nc_fname_inp, nc_fname_out, metric, data_frame, overwrite_flag, vector_flag,
+                                    window_flag, profile, results_fname, resume_flag, frame_key, timer)
+
+    func_name =  __prog__ + ' create_netcdf_file'
+
+    if not check_profile(profile):
+        return None
+
+    batch_flag = not isinstance(data_frame, DataFrame)
+    if batch_flag and resume_flag and frame_key is None:
+        print(ERROR_STR + 'records read in batches can only be resumed if they are identified by frame_key')
+        return None
+
+    ckpt = None
+    if resume_flag:
+        if frame_key is None:
+            frame_key = _frame_digest(data_frame)
+        ckpt_key = {'inp': input_fingerprint(nc_fname_inp), 'metric': metric, 'frame': frame_key,
+                        'vector_flag': vector_flag, 'window_flag': window_flag, 'profile': profile}
+        ckpt = read_checkpoint(nc_fname_out, ckpt_key)
+        if ckpt is None or not ckpt['defined'] or not os.path.isfile(nc_fname_out):
+            if ckpt is not None and os.path.isfile(nc_fname_out):
+                overwrite_flag = True   # output of a run which failed before the file was defined
+            ckpt = new_checkpoint(ckpt_key)
+    resume_defined = ckpt is not None and ckpt['defined']
+
+    def _slab_committer(unit):
+        """
+        return function which records the next slab of unit in the checkpoint
+        """
+        if ckpt is None:
+            return None
+
+        def _slab_done(next_indx):
+            ckpt['done'][unit] = next_indx
+            commit_checkpoint(nc_obj_out, nc_fname_out, ckpt)
+
+        return _slab_done
+
+    # construct new file name for weather
+    # ===================================
+    start_time = time()
+    if resume_defined:
+        print('\nResuming the ' + metric + ' output NetCDF file ' + nc_fname_out + ' from checkpoint '
+                                                                                    + checkpoint_fname(nc_fname_out))
+        nc_obj_out = cdf.Dataset(nc_fname_out, 'a', format='NETCDF4')
+    else:
+        if os.path.isfile(nc_fname_out):
+            if overwrite_flag:
+                try:
+                    os.remove(nc_fname_out)
+                    print('Deleted: ' + nc_fname_out)
+                except PermissionError as e:
+                    print(str(e) + ' -could not delete: ' + nc_fname_out)
+                    return None
+            else:
+                print(nc_fname_out + ' already exists - cannot continue...')
+                return None
+
+        if ckpt is not None:
+            commit_checkpoint(None, nc_fname_out, ckpt)
+
+        print('\nOpening the ' + metric + ' output NetCDF file ' + nc_fname_out)
+        nc_obj_out = cdf.Dataset(nc_fname_out,'w', format='NETCDF4')        # create netCDF4 dataset object
+
+    # output NC file is modelled on EObs
+    # ==================================
+    print('Opening the ' + metric + ' input NetCDF file ' + nc_fname_inp)
+    with timer.stage('read'):
+        nc_obj_inp = cdf.Dataset(nc_fname_inp,'r', format='NETCDF4')
+
+        date_str = '31/12/2000'
+        day, month, year = date_str.split('/')
+        date_obj = datetime(int(year), int(month), int(day), 0, 0)      # TODO: tidy up
+        time_var = nc_obj_inp.variables['time']
+        date_indx_31_12_2000 = cdf.date2index(date_obj, time_var)
+
+    dim_sizes = {}
+    for dname in nc_obj_inp.dimensions:
+        dim_sizes[dname] = len(nc_obj_inp.dimensions[dname])
+
+    if not resume_defined:
+
+        # copy attributes
+        # ===============
+        for attr_name in nc_obj_inp.ncattrs():
+            nc_obj_out.setncatts({attr_name: nc_obj_inp.getncattr(attr_name)})
+
+        print('Copied attributes ')
+
+        # copy dimensions - lat, long and time
+        # ====================================
+        for dname in nc_obj_inp.dimensions:
+            nc_obj_out.createDimension(dname, dim_sizes[dname])
+
+        print('Created dimensions')
+
+    # copy variables, the metric variable is created last
+    # ===================================================
+    slab_flag = window_flag or resume_flag or batch_flag
+    var_names = [variable for variable in nc_obj_inp.variables if variable != metric] + [metric]
+    for variable in var_names:
+        varin = nc_obj_inp.variables[variable]
+        var_dims = varin.dimensions
+        if resume_defined:
+            outVar = nc_obj_out.variables[variable]
+        else:
+            outVar = nc_obj_out.createVariable(variable, varin.datatype, var_dims,
+                                                            **profile_var_kwargs(profile, var_dims, dim_sizes))
+            # copy variable attributes
+            # ========================
+            for attr_name in varin.ncattrs():
+                outVar.setncatts({attr_name: varin.getncattr(attr_name)})
+
+    if ckpt is not None and not resume_defined:
+        ckpt['defined'] = True
+        commit_checkpoint(nc_obj_out, nc_fname_out, ckpt)
+
+    for variable in var_names[:-1]:
+        varin = nc_obj_inp.variables[variable]
+        outVar = nc_obj_out.variables[variable]
+        print('\tProcessing var: ' + variable)
+        with timer.stage('copy variables', 1, varin.size*varin.dtype.itemsize):
+            if slab_flag:
+                strt_indx = 0 if ckpt is None else ckpt['done'].get(variable, 0)
+                _copy_variable_in_slabs(varin, outVar, strt_indx, _slab_committer(variable))
+            else:
+                outVar[:] = varin[:]
+
+    lats = nc_obj_inp.variables['latitude']
+    lons = nc_obj_inp.variables['longitude']
+    resol = lats[1] - lats[0]
+
+    # copy metric variable
+    # ====================
+    print('\tProcessing var: ' + metric)
+    varin = nc_obj_inp.variables[metric]
+    outVar = nc_obj_out.variables[metric]
+    set_profile_cache(outVar, profile)
+    if ckpt is None:
+        done = {}
+    else:
+        done = ckpt['done']
+
+    if batch_flag:
+        with timer.stage('copy variables', 1, varin.size*varin.dtype.itemsize):
+            _copy_variable_in_slabs(varin, outVar, done.get(metric, 0), _slab_committer(metric))
+        nspliced, num_recs, date_curr_indx, lat_long_pairs, save_flag = _splice_batches(outVar, data_frame, lats[0],
+                    lons[0], resol, date_indx_31_12_2000, done.get('batches', 0), _slab_committer('batches'), timer)
+    else:
+        # identify patch
+        # ==============
+        lat_max = data_frame['latitude'].max()
+        lat_min = data_frame['latitude'].min()
+        lon_max = data_frame['longitude'].max()
+        lon_min = data_frame['longitude'].min()
+        lat_indx1 = int((lat_min - lats[0])/resol)
+        lat_indx2 = int((lat_max - lats[0])/resol)
+        lon_indx1 = int((lon_min - lons[0])/resol)
+        lon_indx2 = int((lon_max - lons[0])/resol)
+        print('Will replace patch with lat indices: {} {}\tlong indices: {} {}'\
+                                                                .format(lat_indx1, lat_indx2, lon_indx1, lon_indx2))
+        lat_indx_lo, lat_indx_hi = sorted([lat_indx1, lat_indx2])
+        lon_indx_lo, lon_indx_hi = sorted([lon_indx1, lon_indx2])
+        if window_flag and (min(lat_indx_lo, lon_indx_lo) < 0 or lat_indx_hi >= len(lats)
+                                                                                    or lon_indx_hi >= len(lons)):
+            print('Patch extends beyond the grid of ' + nc_fname_inp + ' - will process the whole variable')
+            window_flag = False
+
+        # edit metric variable with data frame records
+        # ============================================
+        with timer.stage('read') as stage_rec:
+            if window_flag:
+                window = (slice(date_indx_31_12_2000, None), slice(lat_indx_lo, lat_indx_hi + 1),
+                                                                                slice(lon_indx_lo, lon_indx_hi + 1))
+                origin = (date_indx_31_12_2000, lat_indx_lo, lon_indx_lo)
+                trans_var = varin[window]
+            else:
+                origin = (0, 0, 0)
+                trans_var = varin[:, :, :]
+            stage_rec.add(trans_var.shape[0], trans_var.nbytes)
+
+        num_recs = len(data_frame.values)
+        if vector_flag:
+            nspliced, date_curr_indx, lat_long_pairs, save_flag = _splice_records_vectorised(trans_var, data_frame,
+                                                        lats[0], lons[0], resol, date_indx_31_12_2000, origin, timer)
+        else:
+            with timer.stage('splice', num_recs):
+                nspliced, date_curr_indx, lat_long_pairs, save_flag = _splice_records_by_row(trans_var, data_frame,
+                                                        lats[0], lons[0], resol, date_indx_31_12_2000, origin, timer)
+
+        if save_flag:
+            if window_flag:
+                with timer.stage('copy variables', 1, varin.size*varin.dtype.itemsize):
+                    _copy_variable_in_slabs(varin, outVar, done.get(metric, 0), _slab_committer(metric))
+                with timer.stage('write', trans_var.shape[0], trans_var.nbytes):
+                    if not done.get('window', False):
+                        outVar[window] = trans_var
+                        if ckpt is not None:
+                            ckpt['done']['window'] = True
+                            commit_checkpoint(nc_obj_out, nc_fname_out, ckpt)
+            elif slab_flag:
+                with timer.stage('write', trans_var.shape[0], trans_var.nbytes):
+                    _copy_variable_in_slabs(trans_var, outVar, done.get(metric, 0), _slab_committer(metric))
+            else:
+                with timer.stage('write', trans_var.shape[0], trans_var.nbytes):
+                    outVar[:, :, :] = trans_var[:, :, :]  # should save on exit
 
     if save_flag:
-        outVar[:, :, :] = trans_var[:, :, :]  # should save on exit
         print('Copied variable ' + metric + ' to ' + nc_fname_out + ' having spliced {} values from {} records'
                                                                                     .format(nspliced, num_recs))
         print('start and end time indices: {} {}'.format(date_indx_31_12_2000, date_curr_indx))
 
-        # write file of lat/longs:
-        # ========================
-        results_fname = 'E:\\temp\\results.csv'
+    # write file of lat/longs:
+    # ========================
+    if save_flag and results_fname is not None:
         if os.path.isfile(results_fname):
 
             os.remove(results_fname)
@@ -234,19 +568,32 @@ def create_netcdf_file(nc_fname_inp, nc_fname_out, metric, data_frame, overwrite
         # create and write csv file
         # =========================
         print('Creating ' + results_fname + ' - will write {} pairs'.format(len(lat_long_pairs)))
-        fpout = open(results_fname, 'w', newline='')
-        csv_writer = writer(fpout, delimiter=',')
-        output = []
-        for lat_long_pair in lat_long_pairs:
-            lat_indx, lon_indx = lat_long_pair
-            output.append([lats[lat_indx], lons[lon_indx]])
-        csv_writer.writerows(output)
+        with timer.stage('write', len(lat_long_pairs)) as stage_rec:
+            fpout = open(results_fname, 'w', newline='')
+            csv_writer = writer(fpout, delimiter=',')
+            output = []
+            for lat_long_pair in lat_long_pairs:
+                lat_indx, lon_indx = lat_long_pair
+                output.append([lats[lat_indx], lons[lon_indx]])
+            csv_writer.writerows(output)
+            stage_rec.add(nbytes = fpout.tell())
+            fpout.close()
 
     # close netCDF files
     # ==================
-    nc_obj_out.sync()
-    nc_obj_out.close()
+    nbytes_written = dataset_nbytes(nc_obj_out)
+    with timer.stage('flush', 0, nbytes_written):
+        nc_obj_out.sync()
+        nc_obj_out.close()
     nc_obj_inp.close()
+    if ckpt is not None and save_flag:
+        remove_checkpoint(nc_fname_out)     # metric is now on disk, otherwise keep the checkpoint for a rerun
+    if profile is not None:
+        report_profile(profile, nc_fname_out, nbytes_written, time() - start_time)
+    if not save_flag:
+        print(ERROR_STR + 'records could not be spliced - ' + metric + ' variable of ' + nc_fname_out
+                                                                                            + ' has not been written')
+        return None
 
     print('Exiting ' + func_name)
 
@@ -0,0 +1,322 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        run_file_funcs.py
+# Purpose:     read DayCent run files in chunks across processes, parsing only the columns a task requires
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+# Description: the run file is a CSV file with a header line followed by one line per site consisting of
+#              global ID, latitude, longitude, landuse type, soil type, country code and country
+#              the cache of a run file is built in a temporary directory which is renamed to a directory named after
+#              the modification time and size of the run file so that concurrent readers never see a partial cache
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'run_file_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from functools import partial
+from json import load as json_load, dump as json_dump
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from pandas import read_csv, concat, DataFrame, factorize, to_numeric
+
+RUN_FILE_COLUMNS = ['globalID', 'latitude', 'longitude', 'landuse', 'soiltype', 'country_code', 'country']
+RUN_FILE_DTYPES = {'globalID': str, 'latitude': float, 'longitude': float, 'landuse': int, 'soiltype': int,
+                                                                                'country_code': str, 'country': str}
+run_chunk_bytes = 32*1024*1024
+MISSING = -9999
+
+# layout of the binary cache of a run file - country is an index into the list of country names
+# ==============================================================================================
+CACHE_VERSION = 1
+CACHE_DTYPE = np.dtype([('globalID', 'i8'), ('latitude', 'f8'), ('longitude', 'f8'), ('landuse', 'i2'),
+                                    ('soiltype', 'i2'), ('country_code', 'i4'), ('country', 'i2')])
+CACHE_META = 'meta.json'
+
+def _chunk_ranges(run_fname, chunk_bytes = run_chunk_bytes):
+    """
+    split the run file, excluding its header, into byte ranges of about chunk_bytes which begin and end on line
+    boundaries
+    """
+    file_size = os.path.getsize(run_fname)
+    with open(run_fname, 'rb') as fobj:
+        fobj.readline()     # skip header
+        offsets = [fobj.tell()]
+        while offsets[-1] + chunk_bytes < file_size:
+            fobj.seek(offsets[-1] + chunk_bytes)
+            fobj.readline()
+            if fobj.tell() >= file_size:
+                break
+            offsets.append(fobj.tell())
+
+    offsets.append(file_size)
+
+    return [(strt, end) for strt, end in zip(offsets[:-1], offsets[1:]) if end > strt]
+
+def _read_chunk(run_fname, strt, end, columns):
+    """
+    parse requested columns from a byte range of the run file
+    """
+    with open(run_fname, 'rb') as fobj:
+        fobj.seek(strt)
+        data = fobj.read(end - strt)
+
+    dtypes = {col_name: RUN_FILE_DTYPES[col_name] for col_name in columns}
+    return read_csv(BytesIO(data), header=None, names=RUN_FILE_COLUMNS, usecols=columns, dtype=dtypes,
+                                                                                        keep_default_na=False)
+
+def map_run_chunks(run_fname, chunk_func, max_workers = None, chunk_bytes = run_chunk_bytes):
+    """
+    apply chunk_func(run_fname, strt, end) to each chunk of the run file in a pool of processes
+    results are returned in file order, a file of a single chunk is processed in this process
+    """
+    chunk_ranges = _chunk_ranges(run_fname, chunk_bytes)
+    if len(chunk_ranges) <= 1 or max_workers == 1:
+        return [chunk_func(run_fname, strt, end) for strt, end in chunk_ranges]
+
+    with ProcessPoolExecutor(max_workers = max_workers) as executor:
+        futures = [executor.submit(chunk_func, run_fname, strt, end) for strt, end in chunk_ranges]
+        return [future.result() for future in futures]
+
+def _columns_chunk(run_fname, strt, end, columns):
+    """
+    chunk function for read_run_columns
+    """
+    return _read_chunk(run_fname, strt, end, columns)
+
+def read_run_columns(run_fname, columns, max_workers = None, chunk_bytes = run_chunk_bytes):
+    """
+    return data frame of the requested columns of the run file, chunks are parsed in a pool of processes
+    """
+    chunk_frames = map_run_chunks(run_fname, partial(_columns_chunk, columns = list(columns)), max_workers,
+                                                                                                        chunk_bytes)
+    if len(chunk_frames) == 0:
+        return DataFrame(columns = list(columns))
+
+    return concat(chunk_frames, ignore_index=True)
+
+def _country_codes_chunk(run_fname, strt, end):
+    """
+    country and first numeric country code for each country in a chunk, China is skipped
+    also return number of China records and of records with non numeric codes
+    """
+    data_frame = _read_chunk(run_fname, strt, end, ['country_code', 'country'])
+
+    is_china = (data_frame['country'] == 'China').to_numpy()
+    data_frame = data_frame[~is_china]
+
+    is_numeric = data_frame['country_code'].str.isnumeric().to_numpy(dtype=bool)
+    data_frame = data_frame[is_numeric]
+
+    first_codes = data_frame.groupby('country', sort=False)['country_code'].first()
+    country_codes = [(country, int(code)) for country, code in first_codes.items()]
+
+    return country_codes, int(is_china.sum()), int((~is_numeric).sum())
+
+def country_codes_table(run_fname, max_workers = None, chunk_bytes = run_chunk_bytes):
+    """
+    build dictionary of country names and codes from the run file, the code retained for each country is the first
+    in the file; records for China and records with non numeric codes are counted but not used
+    """
+    country_dict = {}
+    n_china = 0
+    n_undefined = 0
+    for country_codes, nchina_chunk, nundefined_chunk in map_run_chunks(run_fname, _country_codes_chunk,
+                                                                                        max_workers, chunk_bytes):
+        for country, country_id in country_codes:
+            country_dict.setdefault(country, country_id)
+        n_china += nchina_chunk
+        n_undefined += nundefined_chunk
+
+    return country_dict, n_china, n_undefined
+
+class RunFileCache(object):
+    """
+    memory-mapped structured array of the run file with indexes by country and by global ID
+    the cache is built on first use and rebuilt whenever the modification time or size of the run file changes
+    """
+    def __init__(self, run_fname, cache_dir = None, max_workers = None):
+        """
+        cache_dir defaults to the run file name with .cache appended
+        """
+        if cache_dir is None:
+            cache_dir = run_fname + '.cache'
+
+        self.run_fname = run_fname
+        self.cache_dir = cache_dir
+
+        run_stat = os.stat(run_fname)
+        self.build_dir = os.path.join(cache_dir, 'v{}_{}_{}'.format(CACHE_VERSION, run_stat.st_mtime_ns,
+                                                                                                run_stat.st_size))
+        meta = self._read_meta()
+        if meta is None:
+            print('Building cache of run file ' + run_fname + ' in ' + cache_dir)
+            meta = self._build(run_stat, max_workers)
+
+        self.country_names = meta['countries']
+        self.country_offsets = meta['country_offsets']
+        self.records = np.load(self._fname('records.npy'), mmap_mode='r')
+        self.country_order = np.load(self._fname('country_order.npy'), mmap_mode='r')
+        self.gid_sorted = np.load(self._fname('gid_sorted.npy'), mmap_mode='r')
+        self.gid_order = np.load(self._fname('gid_order.npy'), mmap_mode='r')
+
+    def _fname(self, short_fname):
+        return os.path.join(self.build_dir, short_fname)
+
+    def _read_meta(self):
+        """
+        the build directory is only renamed into place once complete so the presence of its meta file signifies a
+        complete cache
+        """
+        meta_fname = self._fname(CACHE_META)
+        if not os.path.isfile(meta_fname):
+            return None
+
+        try:
+            with open(meta_fname, 'r') as fmeta:
+                return json_load(fmeta)
+        except (OSError, ValueError):
+            return None
+
+    def _build(self, run_stat, max_workers):
+        """
+        build the cache in a temporary directory then rename it to the build directory, if another process has
+        completed the same build in the meantime its cache is used
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix = '.build_', dir = self.cache_dir)
+        try:
+            meta = self._write_cache(tmp_dir, run_stat, max_workers)
+            try:
+                os.rename(tmp_dir, self.build_dir)
+            except OSError:
+                meta = self._read_meta()
+                if meta is None:
+                    raise
+                print('Using cache of run file ' + self.run_fname + ' built by another process')
+        finally:
+            if os.path.isdir(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        # remove caches of earlier versions of the run file - on POSIX they are deleted even if mapped by another
+        # reader, which keeps its data until it closes, on Windows files which are mapped cannot be deleted and remain
+        # ==============================================================================================================
+        for short_dir in os.listdir(self.cache_dir):
+            old_dir = os.path.join(self.cache_dir, short_dir)
+            if old_dir != self.build_dir and not short_dir.startswith('.build_') and os.path.isdir(old_dir):
+                shutil.rmtree(old_dir, ignore_errors=True)
+
+        return meta
+
+    def _write_cache(self, out_dir, run_stat, max_workers):
+        """
+        parse the run file and write records and indexes as .npy files to out_dir followed by the meta file
+        """
+        data_frame = read_run_columns(self.run_fname, RUN_FILE_COLUMNS, max_workers)
+        global_ids = to_numeric(data_frame['globalID'], errors='raise').to_numpy(dtype=np.int64)
+        country_indxs, countries = factorize(data_frame['country'], sort=True)
+        if len(countries) > np.iinfo(np.int16).max:
+            raise ValueError('run file ' + self.run_fname + ' has too many countries to cache')
+
+        codes = data_frame['country_code'].to_numpy(dtype=str)
+        is_numeric = np.char.isnumeric(codes)
+        country_codes = np.full(len(codes), MISSING, dtype=np.int32)
+        country_codes[is_numeric] = codes[is_numeric].astype(np.int32)
+
+        records = np.empty(len(data_frame), dtype=CACHE_DTYPE)
+        records['globalID'] = global_ids
+        for col_name in ['latitude', 'longitude', 'landuse', 'soiltype']:
+            records[col_name] = data_frame[col_name].to_numpy()
+        records['country_code'] = country_codes
+        records['country'] = country_indxs
+
+        # indexes: rows ordered by country with offsets of each country, and global IDs sorted with their rows
+        # ====================================================================================================
+        country_order = np.argsort(country_indxs, kind='stable')
+        country_offsets = np.searchsorted(country_indxs[country_order], np.arange(len(countries) + 1))
+        gid_order = np.argsort(global_ids, kind='stable')
+
+        np.save(os.path.join(out_dir, 'records.npy'), records)
+        np.save(os.path.join(out_dir, 'country_order.npy'), country_order)
+        np.save(os.path.join(out_dir, 'gid_sorted.npy'), global_ids[gid_order])
+        np.save(os.path.join(out_dir, 'gid_order.npy'), gid_order)
+
+        meta = {'version': CACHE_VERSION, 'run_fname': self.run_fname, 'csv_mtime': run_stat.st_mtime_ns,
+                'csv_size': run_stat.st_size, 'nrecords': len(records), 'countries': [str(country) for country in
+                countries], 'country_offsets': country_offsets.tolist()}
+        with open(os.path.join(out_dir, CACHE_META), 'w') as fmeta:
+            json_dump(meta, fmeta, indent=2)
+
+        return meta
+
+    def country_codes_table(self):
+        """
+        equivalent of country_codes_table taken from the cached records
+        """
+        countries = self.records['country']
+        codes = self.records['country_code']
+        if 'China' in self.country_names:
+            is_china = countries == self.country_names.index('China')
+        else:
+            is_china = np.zeros(len(countries), dtype=bool)
+        is_numeric = codes != MISSING
+
+        usable = ~is_china & is_numeric
+        country_indxs, first_rows = np.unique(countries[usable], return_index=True)
+        first_codes = codes[usable][first_rows]
+        country_dict = {self.country_names[indx]: int(code) for indx, code in zip(country_indxs, first_codes)}
+
+        return country_dict, int(is_china.sum()), int((~is_china & ~is_numeric).sum())
+
+    def country_counts(self):
+        """
+        return dictionary of number of records for each country
+        """
+        return {country: self.country_offsets[indx + 1] - self.country_offsets[indx]
+                                                                    for indx, country in enumerate(self.country_names)}
+
+    def rows_for_country(self, country):
+        """
+        return records for a country, empty if the country is not in the run file
+        """
+        if country not in self.country_names:
+            return self.records[:0]
+
+        indx = self.country_names.index(country)
+        rows = self.country_order[self.country_offsets[indx]:self.country_offsets[indx + 1]]
+
+        return self.records[rows]
+
+    def rows_for_global_ids(self, global_ids):
+        """
+        return records for an array of global IDs together with a mask of those IDs found in the run file
+        records of IDs not found are those of the first row and should be ignored
+        """
+        global_ids = np.asarray(global_ids, dtype=np.int64)
+        nrecs = len(self.gid_sorted)
+        positions = np.searchsorted(self.gid_sorted, global_ids)
+        found = positions < nrecs
+        found[found] = self.gid_sorted[positions[found]] == global_ids[found]
+        positions[~found] = 0
+        if nrecs == 0:
+            return self.records[:0], found
+
+        return self.records[self.gid_order[positions]], found
+
+def open_run_cache(run_fname, max_workers = None):
+    """
+    return RunFileCache of the run file, None if the cache cannot be built e.g. the directory of the run file is read
+    only or global IDs are not numeric, in which case the run file should be read directly
+    """
+    try:
+        return RunFileCache(run_fname, max_workers = max_workers)
+    except (OSError, ValueError) as err:
+        print('Could not use cache of run file {} - will read it directly: {}'.format(run_fname, err))
+        return None
@@ -1,4 +1,10 @@
 import os
+import hashlib
+from json import dump as json_dump
+
+from grid_coords import granular_from_lat_lons
+
+HASH_BLOCK_SIZE = 1024*1024
 
 def remove_file(lgr, fname):
     """
@@ -15,12 +21,31 @@ def remove_file(lgr, fname):
 
 def fetch_granular_lat_lons(latitude, longitude, granularity = 120):
     """
-    create study summary file and write first line
+    return granular latitude and longitude of a single point - for many points use granular_from_lat_lons
     """
-    granularity = 120
+    gran_lats, gran_lons = granular_from_lat_lons([latitude], [longitude], granularity)
+
+    return int(gran_lats[0]), int(gran_lons[0])
+		
 
-    gran_lon = round((180.0 + longitude)*granularity)
-    gran_lat = round((90.0 - latitude)*granularity)
+def file_digest(fname):
+    """
+    SHA-1 digest of file contents, read in fixed size blocks
+    """
+    sha1 = hashlib.sha1()
+    with open(fname, 'rb') as fobj:
+        for block in iter(lambda: fobj.read(HASH_BLOCK_SIZE), b''):
+            sha1.update(block)
+
+    return sha1.hexdigest()
+
+def write_json_atomic(fname, obj, indent = 2):
+    """
+    write obj as JSON to a temporary file then rename it so that an interrupted write leaves an earlier fname intact
+    """
+    tmp_fname = fname + '.tmp'
+    with open(tmp_fname, 'w') as fobj:
+        json_dump(obj, fobj, indent=indent, sort_keys=True)
+    os.replace(tmp_fname, fname)
 
-    return gran_lat, gran_lon
-		
\ No newline at end of file
+    return
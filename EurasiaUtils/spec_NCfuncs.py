@@ -20,23 +20,24 @@ import netCDF4 as cdf
 import numpy as np
 from numpy import arange, full
 
+from nc_profiles import check_profile, profile_var_kwargs, set_profile_cache, report_profile
+from grid_coords import nc_indices_from_granular
+
 missing_value = -999.0
 granularity = 120   # based on HWSD
 
 def getNC_coords(id_, bbox, granularity):
+    """
+    return NetCDF latitude and longitude indices of a single site - for many sites use nc_indices_from_ids
+    """
+    lat_indxs, lon_indxs = nc_indices_from_granular([float(id_[0])], [float(id_[1])], bbox, granularity)
 
-    ll_lon, ll_lat, ur_lon, ur_lat = bbox
-    gran_lat, gran_lon, mu_global, fut_clim_scen, soil_num, lu_change = id_
-
-    laty = 90.0 - (float(gran_lat)/granularity)
-    lonx = (float(gran_lon)/granularity) - 180.0
-
-    lat_indx = round((laty - ll_lat)*granularity)
-    lon_indx = round((lonx - ll_lon)*granularity)
-
-    return list([lat_indx, lon_indx])
+    return list([int(lat_indxs[0]), int(lon_indxs[0])])
 
 def writeNC_set(var_name, ncfile, lat_indx, lon_indx, res):
+    """
+    write one cell time series - for many cells use NCBlockWriter
+    """
 
     # use Python list comprehension to convert res
     # TODO: check length of res
@@ -45,27 +46,165 @@ def writeNC_set(var_name, ncfile, lat_indx, lon_indx, res):
 
     return
 
-def create_NCfile(form, summary_varnames):
+class NCBlockWriter(object):
     """
-    #    call this function before running spec against simulation files
-    #    output_variables = list(['soc', 'co2', 'ch4', 'n2o'])
-    #    for var_name in output_variables[0:1]:
+    collect cell time series into lat band buffers and write contiguous runs of cells as single blocks
+    replaces per cell calls to writeNC_set e.g.
+        with NCBlockWriter(fout_name, summary_varnames.keys()) as nc_writer:
+            nc_writer.write_cell(var_name, lat_indx, lon_indx, res)
     """
-    func_name =  __prog__ + ' create_netcdf_file'
-
-    # set up NC parameters based on contents of first line of the manifest summary file
+    def __init__(self, nc_dset, var_names, max_buffer_bytes = 64*1024*1024, profile = None, on_flush = None):
+        """
+        nc_dset is either the name of a file created by create_NCfile or an open Dataset
+        profile, if given, sets the chunk cache of the variables, see set_profile_cache
+        on_flush, if given, is called after each flush once the buffered cells are synced to disk
+        """
+        if isinstance(nc_dset, str):
+            self.ncfile = cdf.Dataset(nc_dset, 'a', format='NETCDF4')
+            self.owner_flag = True
+        else:
+            self.ncfile = nc_dset
+            self.owner_flag = False
+
+        self.nc_fname = self.ncfile.filepath()
+        self.var_names = list(var_names)
+        self.num_mnths = len(self.ncfile.dimensions['time'])
+        self.max_buffer_bytes = max_buffer_bytes
+        self.profile = profile
+        self.on_flush = on_flush
+        for var_name in self.var_names:
+            set_profile_cache(self.ncfile.variables[var_name], profile)
+
+        # buffer is keyed by lat index then variable name then lon index
+        # ===============================================================
+        self.bands = {}
+        self.nbytes_buffered = 0
+
+        # throughput counters
+        # ===================
+        self.ncells_written = 0
+        self.nbytes_written = 0
+        self.nblocks_written = 0
+        self.nflushes = 0
+        self.start_time = time.time()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def write_cell(self, var_name, lat_indx, lon_indx, res):
+        """
+        buffer the time series res for one cell, flush all bands when the memory threshold is reached
+        raises ValueError for a variable which is not one of var_names or a time series of the wrong length, before
+        anything is buffered
+        """
+        if var_name not in self.var_names:
+            raise ValueError('variable {} is not one of {}'.format(var_name, self.var_names))
+
+        res_flt = np.asarray(res, dtype=np.float32)
+        if res_flt.shape != (self.num_mnths,):
+            raise ValueError('variable {} cell {} {}: expected {} values, got {}'
+                                        .format(var_name, lat_indx, lon_indx, self.num_mnths, res_flt.size))
+
+        band = self.bands.setdefault(lat_indx, {})
+        cells = band.setdefault(var_name, {})
+        if lon_indx not in cells:
+            self.nbytes_buffered += res_flt.nbytes
+        cells[lon_indx] = res_flt
+
+        if self.nbytes_buffered >= self.max_buffer_bytes:
+            self.flush()
+
+        return
+
+    def flush(self):
+        """
+        write each run of contiguous buffered cells in each lat band as a single block
+        """
+        for lat_indx in sorted(self.bands):
+            band = self.bands[lat_indx]
+            for var_name in band:
+                cells = band[var_name]
+                nc_var = self.ncfile.variables[var_name]
+                lon_indxs = sorted(cells)
+                run_strt = 0
+                for indx in range(1, len(lon_indxs) + 1):
+                    if indx < len(lon_indxs) and lon_indxs[indx] == lon_indxs[indx - 1] + 1:
+                        continue
+
+                    run = lon_indxs[run_strt:indx]
+                    block = np.stack([cells[lon_indx] for lon_indx in run])
+                    nc_var[lat_indx, run[0]:run[-1] + 1, :] = block
+                    self.nblocks_written += 1
+                    self.nbytes_written += block.nbytes
+                    run_strt = indx
+
+                self.ncells_written += len(lon_indxs)
+
+        self.bands = {}
+        self.nbytes_buffered = 0
+        self.nflushes += 1
+        self.ncfile.sync()
+        if self.on_flush is not None:
+            self.on_flush()
+
+        return
+
+    def throughput(self):
+        """
+        return counters together with rates since the writer was created
+        """
+        elapsed = time.time() - self.start_time
+        if elapsed > 0:
+            cells_per_sec = self.ncells_written/elapsed
+            mb_per_sec = self.nbytes_written/(1024*1024)/elapsed
+        else:
+            cells_per_sec, mb_per_sec = 0.0, 0.0
+
+        return {'ncells': self.ncells_written, 'nbytes': self.nbytes_written, 'nblocks': self.nblocks_written,
+                'nflushes': self.nflushes, 'elapsed': elapsed, 'cells_per_sec': cells_per_sec,
+                'mb_per_sec': mb_per_sec}
+
+    def close(self):
+        """
+        flush remaining cells, close file if opened here and report throughput
+        """
+        if self.ncfile is None:
+            return
+
+        self.flush()
+        if self.owner_flag:
+            self.ncfile.close()
+        self.ncfile = None
+
+        thruput = self.throughput()
+        print('Wrote {} cell time series in {} blocks and {} flushes to {} in {:.2f} seconds\t'
+              '{:.1f} cells/s\t{:.1f} MB/s'.format(thruput['ncells'], thruput['nblocks'], thruput['nflushes'],
+                            self.nc_fname, thruput['elapsed'], thruput['cells_per_sec'], thruput['mb_per_sec']))
+        if self.profile is not None:
+            report_profile(self.profile, self.nc_fname, self.nbytes_written, thruput['elapsed'])
+
+        return
+
+def study_bbox(form):
+    """
+    return lon/lat extents of the study in form.sims_dir from the first line of its manifest file, None on error
+    """
+    func_name =  __prog__ + ' study_bbox'
 
     sim_dir, study = os.path.split(form.sims_dir)
 
     fname = study + '_summary_manifest.csv'
     full_fname = os.path.join(sim_dir, fname)
-    fut_clim_scen = form.fut_clim_scen
 
     # read first line of study manifest to retrieive lat/lon extents
     # ==============================================================
     if not os.path.isfile(full_fname):
         print('Function: {}\tstudy manifest file: {} does not exist - cannot proceed'.format(func_name, full_fname))
-        return 1
+        return None
 
     fmani = open(full_fname, 'r')
     record = fmani.readline()
@@ -75,12 +214,34 @@ def create_NCfile(form, summary_varnames):
     if len(rec) < 10:
         print('Function: {}\terror in study manifest file: {}\tmust have 10 elements, {} found - cannot proceed'
                                                                         .format(func_name, full_fname, len(rec)))
-        return 1
+        return None
 
     # push lower left latitude southwards by 0.1 degree to make sure all results are included
     adjustment = 0.1
     dummy, dummy, sll_lat, sll_lon, dummy, dummy,  sur_lat, sur_lon, = rec[0:-2]
-    bbox = list([float(sll_lon), float(sll_lat) - adjustment, float(sur_lon), float(sur_lat)])
+
+    return list([float(sll_lon), float(sll_lat) - adjustment, float(sur_lon), float(sur_lat)])
+
+def create_NCfile(form, summary_varnames, profile = None):
+    """
+    #    call this function before running spec against simulation files
+    #    output_variables = list(['soc', 'co2', 'ch4', 'n2o'])
+    #    for var_name in output_variables[0:1]:
+    #    profile is one of the output profiles in nc_profiles e.g. cell_series suits writeNC_set
+    #    pass the same profile to NCBlockWriter to set the chunk cache of the profile when writing
+    """
+    func_name =  __prog__ + ' create_netcdf_file'
+
+    if not check_profile(profile):
+        return 1
+
+    # set up NC parameters based on contents of first line of the manifest summary file
+
+    sim_dir, study = os.path.split(form.sims_dir)
+    fut_clim_scen = form.fut_clim_scen
+    bbox = study_bbox(form)
+    if bbox is None:
+        return 1
 
     # build lat long arrays ilon goes from 0 to 719
     inverse_granularity = 1.0/granularity
@@ -176,8 +337,10 @@ def create_NCfile(form, summary_varnames):
     t1 = time.time()
 
     # create the metrics and assign default data
+    dim_sizes = {'lat': num_alats, 'lon': num_alons, 'time': num_mnths}
     for var_name in var_names:
-        var_varia = ncfile.createVariable(var_name,'f4',('lat','lon','time'),fill_value = -999.0)
+        var_varia = ncfile.createVariable(var_name,'f4',('lat','lon','time'),fill_value = -999.0,
+                                                    **profile_var_kwargs(profile, ('lat','lon','time'), dim_sizes))
         var_varia.units = 'kg/ha'
         var_varia.missing_value = missing_value
 
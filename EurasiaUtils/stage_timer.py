@@ -0,0 +1,209 @@
+#-------------------------------------------------------------------------------
+# Name:        stage_timer.py
+# Purpose:     time the stages of an operation and log their record counts, bytes and rates
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Description: stages are read, validate, splice, copy variables, write and flush; each time a stage is entered its
+#              totals are accumulated and on completion of the operation one line per stage is logged in the form
+#                  operation=convert_csv_file stage=splice calls=1 elapsed=0.412 nrecs=1200 nbytes=0 recs_per_sec=...
+#              the same values are attached to each log record as the stage_timing attribute for structured handlers
+#              if stacks_fname is given a sampling profiler records the stack of the calling thread at fixed
+#              intervals and writes folded stacks e.g. main;convert_csv_file;create_netcdf_file 42
+#              which can be rendered by flamegraph.pl or speedscope
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'stage_timer.py'
+__version__ = '0.0.0'
+__author__ = 's03mm5'
+
+import os
+import sys
+import logging
+import threading
+from time import perf_counter
+from collections import OrderedDict, Counter
+from contextlib import contextmanager
+
+APPLIC_STR = 'eurasia_utils'
+progress_interval = 3.5         # minimum seconds between progress messages
+sample_interval = 0.005         # seconds between stack samples
+
+class StageRecord(object):
+    """
+    running totals of a stage
+    """
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.elapsed = 0.0
+        self.nrecs = 0
+        self.nbytes = 0
+
+    def add(self, nrecs = 0, nbytes = 0):
+        """
+        add records and bytes processed
+        """
+        self.nrecs += int(nrecs)
+        self.nbytes += int(nbytes)
+
+    def as_dict(self):
+        """
+        return totals and rates
+        """
+        recs_per_sec, mb_per_sec = None, None      # rates are not applicable to counts which were not recorded
+        if self.elapsed > 0:
+            if self.nrecs > 0:
+                recs_per_sec = self.nrecs/self.elapsed
+            if self.nbytes > 0:
+                mb_per_sec = self.nbytes/self.elapsed/(1024*1024)
+
+        return {'stage': self.name, 'calls': self.calls, 'elapsed': self.elapsed, 'nrecs': self.nrecs,
+                                'nbytes': self.nbytes, 'recs_per_sec': recs_per_sec, 'mb_per_sec': mb_per_sec}
+
+class StackSampler(object):
+    """
+    sampling profiler - a daemon thread records the stack of the thread which started it
+    """
+    def __init__(self, stacks_fname, interval = sample_interval):
+        self.stacks_fname = stacks_fname
+        self.interval = interval
+        self.stacks = Counter()
+        self.nsamples = 0
+        self._thread_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._sample, name='stack_sampler', daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        """
+        record the current stack of the profiled thread, outermost frame first, until stopped
+        """
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                break
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append('{}:{}'.format(os.path.basename(code.co_filename), code.co_name))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.nsamples += 1
+
+    def stop(self):
+        """
+        stop sampling and write folded stacks, one line per distinct stack followed by its number of samples
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with open(self.stacks_fname, 'w') as fstacks:
+            for stack, count in sorted(self.stacks.items()):
+                fstacks.write('{} {}\n'.format(stack, count))
+
+        return self.nsamples
+
+class StageTimer(object):
+    """
+    accumulate timings of the stages of an operation, use as a context manager so that the timings are logged when
+    the operation completes
+    """
+    def __init__(self, lggr = None, operation = '', stacks_fname = None):
+        if lggr is None:
+            lggr = logging.getLogger(APPLIC_STR)
+        self.lggr = lggr
+        self.operation = operation
+        self.stacks_fname = stacks_fname
+        self.records = OrderedDict()
+        self.sampler = None
+        self._start_time = perf_counter()
+        self._last_progress = {}
+
+    def __enter__(self):
+        self._start_time = perf_counter()
+        if self.stacks_fname is not None:
+            self.sampler = StackSampler(self.stacks_fname)
+            self.sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.sampler is not None:
+            nsamples = self.sampler.stop()
+            self.lggr.info('operation={} wrote {} stack samples to {}'
+                                                            .format(self.operation, nsamples, self.stacks_fname))
+            self.sampler = None
+        self.report()
+
+        return False
+
+    def record(self, name):
+        """
+        return totals of stage name, created on first use
+        """
+        if name not in self.records:
+            self.records[name] = StageRecord(name)
+
+        return self.records[name]
+
+    @contextmanager
+    def stage(self, name, nrecs = 0, nbytes = 0):
+        """
+        time the enclosed block as stage name, counts may also be added to the yielded record within the block
+        """
+        rec = self.record(name)
+        rec.add(nrecs, nbytes)
+        start_time = perf_counter()
+        try:
+            yield rec
+        finally:
+            rec.elapsed += perf_counter() - start_time
+            rec.calls += 1
+
+    def progress(self, name, ndone, ntotal):
+        """
+        log progress of a long running stage no more often than every progress_interval seconds
+        """
+        this_time = perf_counter()
+        if this_time - self._last_progress.get(name, self._start_time) > progress_interval:
+            self.lggr.info('operation={} stage={} progress={}/{}'.format(self.operation, name, ndone, ntotal))
+            self._last_progress[name] = this_time
+
+    def report(self):
+        """
+        log totals and rates of each stage followed by the total elapsed time of the operation
+        return list of dictionaries of stage totals
+        """
+        timings = []
+        for rec in self.records.values():
+            timing = rec.as_dict()
+            timings.append(timing)
+            self.lggr.info('operation={} stage={} calls={} elapsed={:.3f} nrecs={} nbytes={} recs_per_sec={} '
+                           'mb_per_sec={}'.format(self.operation, rec.name, rec.calls, rec.elapsed, rec.nrecs,
+                            rec.nbytes, _fmt_rate(timing['recs_per_sec']), _fmt_rate(timing['mb_per_sec'])),
+                                                        extra={'stage_timing': dict(timing, operation=self.operation)})
+        self.lggr.info('operation={} stage=total elapsed={:.3f}'.format(self.operation,
+                                                                                perf_counter() - self._start_time))
+        return timings
+
+def _fmt_rate(rate):
+    """
+    format a rate, n/a where it is not applicable
+    """
+    if rate is None:
+        return 'n/a'
+
+    return '{:.1f}'.format(rate)
+
+def form_timer(form, operation):
+    """
+    return StageTimer logging through form.lggr, stack samples are written to the stacks_fname setting if present
+    """
+    settings = getattr(form, 'settings', {})
+
+    return StageTimer(getattr(form, 'lggr', None), operation, settings.get('stacks_fname'))
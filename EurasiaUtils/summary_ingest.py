@@ -0,0 +1,245 @@
+#-------------------------------------------------------------------------------
+# Name:        summary_ingest.py
+# Purpose:     parse SUMMARY.OUT files of Spatial Ecosse simulations in a pool of processes and write the monthly
+#              series to the NetCDF file made by spec_NCfuncs.create_NCfile
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Description: each simulation directory is named after its six field site ID separated by underscores, leading
+#              letters of numeric fields are ignored e.g. lat004567_lon023456_mu12345_A1B_s01_lu0
+#              SUMMARY.OUT consists of a line of column headings followed by one line per month, the final months
+#              matching the time dimension of the NetCDF file are used
+#              workers parse batches of directories and return series with their grid indices, this process is the
+#              only writer and buffers series with NCBlockWriter
+#              in resumable mode the batches whose cells have been flushed are recorded in a checkpoint after each
+#              flush so that an interrupted ingest continues with the remaining batches
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+#!/usr/bin/env python
+
+__prog__ = 'summary_ingest.py'
+__version__ = '0.0.0'
+__author__ = 's03mm5'
+
+import os
+import re
+import time
+from hashlib import sha1
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import netCDF4 as cdf
+
+from grid_coords import nc_indices_from_ids
+from tree_compare_funcs import scan_tree
+from spec_NCfuncs import NCBlockWriter, create_NCfile, study_bbox, granularity
+from nc_checkpoint import new_checkpoint, read_checkpoint, commit_checkpoint, remove_checkpoint
+
+ERROR_STR = '*** Error *** '
+SUMMARY_FNAME = 'SUMMARY.OUT'
+NUMERIC_ID_FIELDS = [0, 1, 2, 4, 5]     # all but the future climate scenario
+ingest_batch_size = 64                  # simulation directories parsed by each worker task
+max_messages = 10                       # rejected directories reported individually
+
+def decode_sim_dir(dir_name):
+    """
+    return six field site ID of a simulation directory, None if the name is not of the expected form
+    """
+    fields = dir_name.split('_')
+    if len(fields) != 6:
+        return None
+
+    site_id = []
+    for indx, field in enumerate(fields):
+        if indx in NUMERIC_ID_FIELDS:
+            field = re.sub('^[A-Za-z]+', '', field)
+            if not field.isdigit():
+                return None
+            site_id.append(int(field))
+        else:
+            site_id.append(field)
+
+    return site_id
+
+def read_summary_file(summary_fname, col_names, num_mnths):
+    """
+    return array of shape (num_mnths, number of columns) of the final num_mnths lines of a SUMMARY.OUT file
+    """
+    with open(summary_fname, 'r') as fsumm:
+        lines = fsumm.read().splitlines()
+
+    headings = lines[0].split()
+    missing = [col_name for col_name in col_names if col_name not in headings]
+    if len(missing) > 0:
+        raise ValueError('columns {} not found in {}'.format(missing, summary_fname))
+
+    col_indxs = [headings.index(col_name) for col_name in col_names]
+    records = [line.split() for line in lines[1:] if line.strip() != '']
+    if len(records) < num_mnths:
+        raise ValueError('{} has {} months, expected {}'.format(summary_fname, len(records), num_mnths))
+
+    return np.array([[rec[indx] for indx in col_indxs] for rec in records[-num_mnths:]], dtype=np.float32)
+
+def _parse_batch(sims_dir, rel_paths, summary_varnames, bbox, granularity, nlats, nlons, num_mnths):
+    """
+    worker task: parse SUMMARY.OUT files of a batch of simulation directories
+    return list of (lat_indx, lon_indx, series), where series is an array with a column for each variable, and
+    list of messages for directories which could not be used
+    """
+    col_names = list(summary_varnames.values())
+    site_ids = []
+    series = []
+    messages = []
+    for rel_path in rel_paths:
+        dir_name = os.path.basename(os.path.dirname(os.path.join(sims_dir, rel_path)))
+        site_id = decode_sim_dir(dir_name)
+        if site_id is None:
+            messages.append('directory name {} is not a site ID'.format(dir_name))
+            continue
+        try:
+            series.append(read_summary_file(os.path.join(sims_dir, rel_path), col_names, num_mnths))
+        except (OSError, ValueError, IndexError) as err:
+            messages.append(str(err))
+            continue
+        site_ids.append(site_id[:2])
+
+    if len(site_ids) == 0:
+        return [], messages
+
+    lat_indxs, lon_indxs = nc_indices_from_ids(site_ids, bbox, granularity)
+    cells = []
+    for lat_indx, lon_indx, cell_series in zip(lat_indxs, lon_indxs, series):
+        if 0 <= lat_indx < nlats and 0 <= lon_indx < nlons:
+            cells.append((int(lat_indx), int(lon_indx), cell_series))
+        else:
+            messages.append('cell {} {} lies outside the grid'.format(lat_indx, lon_indx))
+
+    return cells, messages
+
+def _ingest_key(sims_dir, rel_paths, summary_varnames, bbox, granularity, batch_size, fut_years):
+    """
+    return checkpoint key identifying the inputs of an ingest, fut_years is the first and last year of the time axis
+    """
+    return {'sims_dir': os.path.abspath(sims_dir), 'files': sha1('\n'.join(rel_paths).encode()).hexdigest(),
+            'batch_size': batch_size, 'summary_varnames': summary_varnames, 'bbox': list(bbox),
+            'granularity': granularity, 'fut_years': None if fut_years is None else list(fut_years)}
+
+def ingest_summaries(sims_dir, nc_fname, summary_varnames, bbox, granularity = granularity, max_workers = None,
+                batch_size = ingest_batch_size, profile = None, resume_flag = False, fut_years = None, rel_paths = None):
+    """
+    write series of each variable from the SUMMARY.OUT files beneath sims_dir to the NetCDF file nc_fname
+    summary_varnames maps NetCDF variable names to SUMMARY.OUT column headings
+    resume_flag skips batches recorded in the checkpoint of an interrupted ingest of the same files
+    fut_years is the first and last year of the time axis of nc_fname and rel_paths the SUMMARY.OUT files beneath
+    sims_dir, scanned if None
+    return dictionary of numbers of files found, cells written and files rejected
+    """
+    start_time = time.time()
+    if max_workers is None:
+        max_workers = os.cpu_count()
+    if rel_paths is None:
+        rel_paths = sorted(scan_tree(sims_dir, SUMMARY_FNAME))
+    batches = [rel_paths[indx:indx + batch_size] for indx in range(0, len(rel_paths), batch_size)]
+    var_names = list(summary_varnames.keys())
+    print('Found {} {} files in {}'.format(len(rel_paths), SUMMARY_FNAME, sims_dir))
+
+    ncfile = cdf.Dataset(nc_fname, 'a', format='NETCDF4')
+    nlats, nlons = len(ncfile.dimensions['lat']), len(ncfile.dimensions['lon'])
+    num_mnths = len(ncfile.dimensions['time'])
+
+    ncells = 0
+    nrejected = 0
+    ckpt = None
+    batches_done = set()
+    unflushed = []      # batch index, cells and rejections of batches passed to the writer since the last flush
+    if resume_flag:
+        ckpt_key = _ingest_key(sims_dir, rel_paths, summary_varnames, bbox, granularity, batch_size, fut_years)
+        ckpt = read_checkpoint(nc_fname, ckpt_key)
+        if ckpt is None:
+            ckpt = new_checkpoint(ckpt_key)
+            ckpt['defined'] = True
+            ckpt['done'] = {'batches': [], 'ncells': 0, 'nrejected': 0}
+            commit_checkpoint(ncfile, nc_fname, ckpt)
+        else:
+            batches_done = set(ckpt['done']['batches'])
+            ncells, nrejected = ckpt['done']['ncells'], ckpt['done']['nrejected']
+            print('Resuming ingest to {} - {} of {} batches already written'.format(nc_fname, len(batches_done),
+                                                                                                    len(batches)))
+
+    def _commit_flushed():
+        """
+        record batches whose cells are now on disk
+        """
+        if ckpt is None:
+            return
+        for batch_indx, ncells_batch, nrejected_batch in unflushed:
+            ckpt['done']['batches'].append(batch_indx)
+            ckpt['done']['ncells'] += ncells_batch
+            ckpt['done']['nrejected'] += nrejected_batch
+        del unflushed[:]
+        commit_checkpoint(ncfile, nc_fname, ckpt)
+
+    with NCBlockWriter(ncfile, var_names, profile = profile, on_flush = _commit_flushed) as nc_writer, \
+                                                        ProcessPoolExecutor(max_workers = max_workers) as executor:
+
+        # keep a bounded number of batches in flight so parsed series do not accumulate faster than they are written
+        # ==========================================================================================================
+        max_in_flight = 4*max_workers
+        pending = {}
+        batch_indxs = [batch_indx for batch_indx in range(len(batches)) if batch_indx not in batches_done]
+        next_batch = 0
+        while next_batch < len(batch_indxs) or len(pending) > 0:
+            while next_batch < len(batch_indxs) and len(pending) < max_in_flight:
+                batch_indx = batch_indxs[next_batch]
+                pending[executor.submit(_parse_batch, sims_dir, batches[batch_indx], summary_varnames, bbox,
+                                                            granularity, nlats, nlons, num_mnths)] = batch_indx
+                next_batch += 1
+
+            done, dummy = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch_indx = pending.pop(future)
+                cells, messages = future.result()
+                for lat_indx, lon_indx, cell_series in cells:
+                    for var_indx, var_name in enumerate(var_names):
+                        nc_writer.write_cell(var_name, lat_indx, lon_indx, cell_series[:, var_indx])
+                ncells += len(cells)
+                for message in messages[:max(0, max_messages - nrejected)]:
+                    print(ERROR_STR + message)
+                nrejected += len(messages)
+                unflushed.append((batch_indx, len(cells), len(messages)))
+
+    ncfile.close()
+    if ckpt is not None:
+        remove_checkpoint(nc_fname)
+    elapsed = time.time() - start_time
+    print('Ingested {} of {} {} files in {:.1f} seconds\t{:.1f} files/s\trejected: {}'
+          .format(ncells, len(rel_paths), SUMMARY_FNAME, elapsed, len(rel_paths)/max(elapsed, 1e-6), nrejected))
+
+    return {'nfiles': len(rel_paths), 'ncells': ncells, 'nrejected': nrejected, 'elapsed': elapsed}
+
+def ingest_study(form, summary_varnames, max_workers = None, profile = None, resume_flag = False):
+    """
+    create the NetCDF file for the study in form.sims_dir and fill it from the SUMMARY.OUT files
+    if resume_flag is set and an ingest of the same inputs into the file was interrupted the file is reused and the
+    ingest resumed, otherwise the file is created afresh
+    """
+    study = os.path.split(form.sims_dir)[1]
+    nc_fname = os.path.join(form.outdir, study + '.nc')
+    rel_paths = sorted(scan_tree(form.sims_dir, SUMMARY_FNAME))
+    fut_years = [form.fut_start_year, form.fut_end_year]
+    ckpt = None
+    if resume_flag and os.path.isfile(nc_fname):
+        bbox = study_bbox(form)
+        if bbox is None:
+            return None
+        ckpt = read_checkpoint(nc_fname, _ingest_key(form.sims_dir, rel_paths, summary_varnames, bbox, granularity,
+                                                                                    ingest_batch_size, fut_years))
+    if ckpt is None:
+        nc_fname = create_NCfile(form, summary_varnames, profile)
+        if nc_fname == 1:
+            return None
+    else:
+        form.bbox = ckpt['key']['bbox']
+        form.granularity = ckpt['key']['granularity']
+
+    return ingest_summaries(form.sims_dir, nc_fname, summary_varnames, form.bbox, form.granularity, max_workers,
+                        profile = profile, resume_flag = resume_flag, fut_years = fut_years, rel_paths = rel_paths)
@@ -0,0 +1,251 @@
+"""
+#-------------------------------------------------------------------------------
+# Name:        tree_compare_funcs.py
+# Purpose:     compare files of a given name, e.g. management.txt, in two simulation trees
+# Author:      Mike Martin
+# Created:     18/10/2026
+# Licence:     <your licence>
+# Description: trees are enumerated with scandir, file pairs are compared on a pool of threads since comparisons
+#              on network drives are latency bound
+#              alternatively each tree keeps a persistent index of size, modification time and SHA-1 digest of
+#              each file, only files whose size or modification time have changed are rehashed when the index is
+#              refreshed and two indexes are compared without reading file contents
+#-------------------------------------------------------------------------------
+#
+"""
+__prog__ = 'tree_compare_funcs.py'
+__version__ = '0.0.1'
+__author__ = 's03mm5'
+
+import os
+import time
+from csv import writer
+from json import load as json_load
+from filecmp import cmp as cmpr_two_files
+from concurrent.futures import ThreadPoolExecutor
+
+from sbs_misc_utils import file_digest, write_json_atomic
+
+ERROR_STR = '*** Error *** '
+MNGMNT_FNAME = 'management.txt'
+CMPR_STATUSES = ['identical', 'differ', 'missing_a', 'missing_b']
+HASH_INDEX_VERSION = 1
+HASH_INDEX_SUFFIX = '.index.json'
+
+def scan_tree(root_dir, target_fname = MNGMNT_FNAME):
+    """
+    return dictionary of size and modification time in nanoseconds of each file named target_fname beneath
+    root_dir keyed by path relative to root_dir
+    """
+    found = {}
+    dirs_to_scan = [root_dir]
+    while len(dirs_to_scan) > 0:
+        directory = dirs_to_scan.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs_to_scan.append(entry.path)
+                    elif entry.name == target_fname and entry.is_file():
+                        entry_stat = entry.stat()
+                        found[os.path.relpath(entry.path, root_dir)] = (entry_stat.st_size, entry_stat.st_mtime_ns)
+        except OSError as err:
+            print(ERROR_STR + 'could not scan {}: {}'.format(directory, err))
+
+    return found
+
+def _compare_pair(fname_a, fname_b, size_a, size_b):
+    """
+    compare two files, sizes having already been obtained from the scans
+    """
+    if size_a != size_b:
+        return 'differ'
+
+    if cmpr_two_files(fname_a, fname_b, shallow=False):
+        return 'identical'
+
+    return 'differ'
+
+def write_comparison_report(report_fname, results):
+    """
+    write CSV file of status, relative path and sizes of each file compared
+    """
+    with open(report_fname, 'w', newline='') as fobj:
+        csv_writer = writer(fobj)
+        csv_writer.writerow(['status', 'rel_path', 'size_a', 'size_b'])
+        for rel_path in sorted(results):
+            status, size_a, size_b = results[rel_path]
+            csv_writer.writerow([status, rel_path, size_a, size_b])
+
+    return
+
+def compare_trees(root_a, root_b, target_fname = MNGMNT_FNAME, max_workers = 16, report_fname = None,
+                                                                                                index_flag = False):
+    """
+    compare files named target_fname in two trees, files of different size are not read
+    return totals of identical, differing and missing files, missing_a being files present only beneath root_b
+    and missing_b files present only beneath root_a; details are written to report_fname if given
+    if index_flag is set the hash index of each tree is refreshed and the indexes are compared instead
+    """
+    start_time = time.time()
+
+    if index_flag:
+        return _compare_indexed_trees(root_a, root_b, target_fname, max_workers, report_fname, start_time)
+
+    # enumerate both trees concurrently
+    # =================================
+    with ThreadPoolExecutor(max_workers = 2) as executor:
+        future_a = executor.submit(scan_tree, root_a, target_fname)
+        future_b = executor.submit(scan_tree, root_b, target_fname)
+        files_a = {rel_path: stats[0] for rel_path, stats in future_a.result().items()}
+        files_b = {rel_path: stats[0] for rel_path, stats in future_b.result().items()}
+
+    print('Found {} {} files in {} and {} in {}'.format(len(files_a), target_fname, root_a, len(files_b), root_b))
+
+    results = {}
+    for rel_path in files_a:
+        if rel_path not in files_b:
+            results[rel_path] = ('missing_b', files_a[rel_path], None)
+    for rel_path in files_b:
+        if rel_path not in files_a:
+            results[rel_path] = ('missing_a', None, files_b[rel_path])
+
+    # compare pairs
+    # =============
+    common = [rel_path for rel_path in files_a if rel_path in files_b]
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        statuses = executor.map(lambda rel_path: _compare_pair(os.path.join(root_a, rel_path),
+                                os.path.join(root_b, rel_path), files_a[rel_path], files_b[rel_path]), common)
+        for rel_path, status in zip(common, statuses):
+            results[rel_path] = (status, files_a[rel_path], files_b[rel_path])
+
+    return _report_comparison(root_a, root_b, results, len(common), report_fname, start_time)
+
+def _report_comparison(root_a, root_b, results, ncompared, report_fname, start_time):
+    """
+    total results by status, write report if requested
+    """
+    totals = {status: 0 for status in CMPR_STATUSES}
+    for status, size_a, size_b in results.values():
+        totals[status] += 1
+
+    if report_fname is not None:
+        write_comparison_report(report_fname, results)
+        print('Wrote comparison report ' + report_fname)
+
+    print('Compared {} files in {:.1f} seconds\tidentical: {}\tdiffer: {}\tonly in {}: {}\tonly in {}: {}'
+          .format(ncompared, time.time() - start_time, totals['identical'], totals['differ'],
+                                                            root_a, totals['missing_b'], root_b, totals['missing_a']))
+    return totals
+
+def hash_index_fname(root_dir, target_fname = MNGMNT_FNAME):
+    """
+    default location of the hash index of a tree
+    """
+    return os.path.join(root_dir, target_fname + HASH_INDEX_SUFFIX)
+
+def read_hash_index(index_fname, target_fname = MNGMNT_FNAME):
+    """
+    return dictionary of [size, mtime_ns, digest] keyed by relative path, empty if the index is absent, unreadable
+    or was built for another file name or version
+    """
+    if not os.path.isfile(index_fname):
+        return {}
+
+    try:
+        with open(index_fname, 'r') as findx:
+            hash_index = json_load(findx)
+    except (OSError, ValueError) as err:
+        print('Could not read hash index {} - all files will be hashed: {}'.format(index_fname, err))
+        return {}
+
+    if hash_index.get('version') != HASH_INDEX_VERSION or hash_index.get('target_fname') != target_fname:
+        return {}
+
+    return hash_index['files']
+
+def write_hash_index(index_fname, files, target_fname = MNGMNT_FNAME):
+    """
+    write index of [size, mtime_ns, digest] keyed by relative path
+    """
+    hash_index = {'version': HASH_INDEX_VERSION, 'target_fname': target_fname, 'files': files}
+    write_json_atomic(index_fname, hash_index, indent = 1)
+
+    return
+
+def refresh_hash_index(root_dir, target_fname = MNGMNT_FNAME, index_fname = None, max_workers = 16):
+    """
+    bring the hash index of a tree up to date, only files which are new or whose size or modification time have
+    changed are read; entries for files which no longer exist are dropped
+    return dictionary of [size, mtime_ns, digest] keyed by relative path
+    """
+    start_time = time.time()
+    if index_fname is None:
+        index_fname = hash_index_fname(root_dir, target_fname)
+
+    old_files = read_hash_index(index_fname, target_fname)
+    files = {}
+    to_hash = []
+    for rel_path, (size, mtime_ns) in scan_tree(root_dir, target_fname).items():
+        old_entry = old_files.get(rel_path)
+        if old_entry is not None and old_entry[0] == size and old_entry[1] == mtime_ns:
+            files[rel_path] = old_entry
+        else:
+            to_hash.append((rel_path, size, mtime_ns))
+
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        digests = executor.map(lambda rel_file: file_digest(os.path.join(root_dir, rel_file[0])), to_hash)
+        for (rel_path, size, mtime_ns), digest in zip(to_hash, digests):
+            files[rel_path] = [size, mtime_ns, digest]
+
+    nremoved = len([rel_path for rel_path in old_files if rel_path not in files])
+    if len(to_hash) > 0 or nremoved > 0 or not os.path.isfile(index_fname):
+        write_hash_index(index_fname, files, target_fname)
+
+    print('Refreshed hash index {} in {:.1f} seconds\tfiles: {}\thashed: {}\tremoved: {}\tdistinct: {}'
+          .format(index_fname, time.time() - start_time, len(files), len(to_hash), nremoved,
+                                                                                        count_distinct_files(files)))
+    return files
+
+def count_distinct_files(files):
+    """
+    number of distinct file contents in a hash index
+    """
+    return len(set(entry[2] for entry in files.values()))
+
+def diff_hash_indexes(files_a, files_b):
+    """
+    compare two hash indexes without reading file contents
+    return dictionary of (status, size_a, size_b) keyed by relative path as written by write_comparison_report
+    """
+    results = {}
+    for rel_path, (size_a, dummy, digest_a) in files_a.items():
+        if rel_path in files_b:
+            size_b, dummy, digest_b = files_b[rel_path]
+            if size_a == size_b and digest_a == digest_b:
+                status = 'identical'
+            else:
+                status = 'differ'
+            results[rel_path] = (status, size_a, size_b)
+        else:
+            results[rel_path] = ('missing_b', size_a, None)
+
+    for rel_path, (size_b, dummy, digest_b) in files_b.items():
+        if rel_path not in files_a:
+            results[rel_path] = ('missing_a', None, size_b)
+
+    return results
+
+def _compare_indexed_trees(root_a, root_b, target_fname, max_workers, report_fname, start_time):
+    """
+    refresh hash indexes of both trees concurrently then diff them
+    """
+    with ThreadPoolExecutor(max_workers = 2) as executor:
+        future_a = executor.submit(refresh_hash_index, root_a, target_fname, None, max_workers)
+        future_b = executor.submit(refresh_hash_index, root_b, target_fname, None, max_workers)
+        files_a, files_b = future_a.result(), future_b.result()
+
+    ncommon = len([rel_path for rel_path in files_a if rel_path in files_b])
+    results = diff_hash_indexes(files_a, files_b)
+
+    return _report_comparison(root_a, root_b, results, ncommon, report_fname, start_time)
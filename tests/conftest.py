@@ -0,0 +1,7 @@
+"""
+the modules of EurasiaUtils are imported as top level modules, as they are by the GUI and CLI
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'EurasiaUtils'))
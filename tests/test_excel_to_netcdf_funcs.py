@@ -0,0 +1,53 @@
+"""
+the xlrd and streaming openpyxl readers of convert_excel_file must write identical CSV files
+"""
+import os
+from datetime import datetime
+
+import pytest
+
+openpyxl = pytest.importorskip('openpyxl')
+pytest.importorskip('xlrd')
+
+from excel_to_netcdf_funcs import convert_excel_file, csv_headers
+from EurasiaUtilsCLI import _headless_form
+
+ROWS = [
+    [52.25, -1.5, datetime(2001, 3, 15), 1.0, '2', 7.25, 0.5],
+    [52.25, -1.5, datetime(2000, 12, 15), 0.0, '1', 1.5, 0.5],     # not after 2000
+    [52.5, -1.25, datetime(2001, 6, 15), 1.0, '3', 14, 0.25],       # integer tg
+    ['52.5', -1.25, datetime(2001, 7, 15), 1.0, '3', 15.0, 0.25],   # latitude as text
+    [52.5, None, datetime(2001, 8, 15), 1.0, '3', 15.0, 0.25],      # no longitude
+    [52.5, -1.25, 'August', 1.0, '3', 15.0, 0.25],                  # date as text
+    [52.5, -1.25, datetime(2001, 9, 15), 1.0, 4, 10.0, 0.25],       # season as number
+    [52.5, -1.25, datetime(2001, 10, 15), 1.0, '4', 'n/a', 0.25],   # tg as text
+    [52.5, -1.25, datetime(2001, 11, 15), 1.0, '4', 9.5, True],     # season difference as boolean
+    [52.5, -1.25, datetime(2001, 12, 15), None, '1', 3.0, 0.25],    # no year
+    [52.75, -1.0, datetime(2002, 1, 15), 2.0, '1', -2.5, 0.125],
+]
+
+def _convert(excel_fname, stream_flag):
+    form = _headless_form({'excel_fname': str(excel_fname)})
+    csv_fname = convert_excel_file(form, stream_flag = stream_flag)
+    with open(csv_fname, 'r') as fcsv:
+        lines = fcsv.read().splitlines()
+    os.remove(csv_fname)
+
+    return lines
+
+def test_readers_write_same_csv(tmp_path):
+    excel_fname = tmp_path / 'sites_Tg.xlsx'
+    work_book = openpyxl.Workbook()
+    sheet = work_book.active
+    sheet.append(['lat', 'lon', 'date', 'year', 'season', 'tg', 'seasdif'])
+    for row in ROWS:
+        sheet.append(row)
+    work_book.save(str(excel_fname))
+
+    legacy_lines = _convert(excel_fname, stream_flag = False)
+    stream_lines = _convert(excel_fname, stream_flag = True)
+
+    assert legacy_lines == stream_lines
+    assert legacy_lines[0] == ','.join(csv_headers)
+    assert legacy_lines[1:] == ['2,52.25,-1.5,2001-03-15,7.25,0.5', '3,52.5,-1.25,2001-06-15,14.0,0.25',
+                                                                            '1,52.75,-1.0,2002-01-15,-2.5,0.125']
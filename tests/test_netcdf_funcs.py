@@ -0,0 +1,104 @@
+"""
+the row, vectorised, window, resume and batch splices of create_netcdf_file must write the same metric variable and
+lat/longs, also when an interrupted run is completed from its checkpoint
+"""
+import os
+
+import numpy as np
+import pytest
+from pandas import read_csv
+
+cdf = pytest.importorskip('netCDF4')
+
+import netcdf_funcs
+from benchmark_funcs import BENCH_METRIC, make_eobs_template, make_seasonal_csv
+from excel_to_netcdf_funcs import csv_headers
+from nc_checkpoint import checkpoint_fname
+
+BATCH_SIZE = 50
+
+@pytest.fixture(scope='module')
+def inputs(tmp_path_factory):
+    work_dir = tmp_path_factory.mktemp('splice')
+    eobs_fname = make_eobs_template(str(work_dir / 'eobs'), 40, 50, 3)
+    csv_fname = str(work_dir / 'sites_Tg.csv')
+    make_seasonal_csv(csv_fname, 6, 3)
+    data_frame = read_csv(csv_fname, sep=',', names=csv_headers, skiprows=1)
+
+    return work_dir, eobs_fname, data_frame
+
+def _batches(data_frame):
+    return iter([data_frame.iloc[strt:strt + BATCH_SIZE] for strt in range(0, len(data_frame), BATCH_SIZE)])
+
+def _metric_values(nc_fname):
+    with cdf.Dataset(nc_fname) as nc_obj:
+        return nc_obj.variables[BENCH_METRIC][:].filled()
+
+def _create(inputs, short_fname, records, **kwargs):
+    work_dir, eobs_fname, data_frame = inputs
+    nc_fname = str(work_dir / short_fname)
+    results_fname = nc_fname + '.csv'
+    assert netcdf_funcs.create_netcdf_file(eobs_fname, nc_fname, BENCH_METRIC, records, True,
+                                                                results_fname = results_fname, **kwargs) == nc_fname
+    with open(results_fname, 'r') as fres:
+        lat_lons = fres.read()
+
+    return _metric_values(nc_fname), lat_lons
+
+def test_splice_paths_agree(inputs):
+    work_dir, eobs_fname, data_frame = inputs
+    expected, expected_lat_lons = _create(inputs, 'row.nc', data_frame, vector_flag = False)
+    assert not np.array_equal(expected, _metric_values(eobs_fname))
+    assert len(expected_lat_lons.splitlines()) == 6*6     # sites form a square
+
+    for short_fname, records, kwargs in [('vector.nc', data_frame, {}),
+                                         ('window.nc', data_frame, {'window_flag': True}),
+                                         ('resume.nc', data_frame, {'resume_flag': True}),
+                                         ('batches.nc', _batches(data_frame), {})]:
+        values, lat_lons = _create(inputs, short_fname, records, **kwargs)
+        assert np.array_equal(values, expected), short_fname
+        assert lat_lons == expected_lat_lons, short_fname
+
+def test_failed_splice_returns_none(inputs):
+    work_dir, eobs_fname, data_frame = inputs
+    bad_frame = data_frame.copy()
+    bad_frame.loc[3, 'season'] = 7
+    nc_fname = str(work_dir / 'bad.nc')
+    assert netcdf_funcs.create_netcdf_file(eobs_fname, nc_fname, BENCH_METRIC, bad_frame, True,
+                                                                                        results_fname = None) is None
+
+@pytest.mark.parametrize('batch_flag', [False, True])
+def test_resume_completes_interrupted_file(inputs, monkeypatch, capsys, batch_flag):
+    work_dir, eobs_fname, data_frame = inputs
+    expected, expected_lat_lons = _create(inputs, 'complete.nc', data_frame)
+    if batch_flag:
+        short_fname, nsplices, kwargs = 'resume_batches.nc', 3, {'frame_key': 'batches of {}'.format(BATCH_SIZE)}
+        records = _batches
+    else:
+        short_fname, nsplices, kwargs = 'resume_window.nc', 1, {'window_flag': True}
+        records = lambda data_frame: data_frame
+    nc_fname = str(work_dir / short_fname)
+
+    # interrupt the run part way through splicing, after the other variables have been copied
+    # ======================================================================================
+    splice = netcdf_funcs._splice_records_vectorised
+    ncalls = []
+
+    def _interrupted_splice(*args, **kwargs):
+        ncalls.append(1)
+        if len(ncalls) == nsplices:
+            raise KeyboardInterrupt
+        return splice(*args, **kwargs)
+
+    monkeypatch.setattr(netcdf_funcs, '_splice_records_vectorised', _interrupted_splice)
+    with pytest.raises(KeyboardInterrupt):
+        _create(inputs, short_fname, records(data_frame), resume_flag = True, **kwargs)
+    assert os.path.isfile(checkpoint_fname(nc_fname))
+
+    monkeypatch.undo()
+    capsys.readouterr()
+    values, lat_lons = _create(inputs, short_fname, records(data_frame), resume_flag = True, **kwargs)
+    assert 'Resuming the ' + BENCH_METRIC in capsys.readouterr().out
+    assert np.array_equal(values, expected)
+    assert lat_lons == expected_lat_lons
+    assert not os.path.isfile(checkpoint_fname(nc_fname))
@@ -0,0 +1,38 @@
+"""
+the binary cache of a run file must give the same answers as the chunked reader
+"""
+import numpy as np
+
+from benchmark_funcs import make_run_file
+from run_file_funcs import RUN_FILE_COLUMNS, RunFileCache, country_codes_table, read_run_columns
+
+CHUNK_BYTES = 16*1024       # several chunks of the run file
+
+def test_cache_matches_chunked_reader(tmp_path):
+    run_fname = str(tmp_path / 'run_file.csv')
+    make_run_file(run_fname, 5000, ncountries = 12)
+    data_frame = read_run_columns(run_fname, RUN_FILE_COLUMNS, max_workers = 2, chunk_bytes = CHUNK_BYTES)
+    run_cache = RunFileCache(run_fname, max_workers = 2)
+
+    assert run_cache.country_codes_table() == country_codes_table(run_fname, max_workers = 2,
+                                                                                            chunk_bytes = CHUNK_BYTES)
+    assert run_cache.country_counts() == data_frame['country'].value_counts().to_dict()
+
+    for country in ['Country_003', 'China', 'Atlantis']:
+        rows = run_cache.rows_for_country(country)
+        expected = data_frame[data_frame['country'] == country]
+        assert rows['globalID'].tolist() == expected['globalID'].astype(int).tolist()
+        assert np.array_equal(rows['latitude'], expected['latitude'].to_numpy())
+
+    rows, found = run_cache.rows_for_global_ids([4999, 10, 123456])
+    assert found.tolist() == [True, True, False]
+    assert rows['globalID'][found].tolist() == [4999, 10]
+    assert rows['soiltype'][found].tolist() == data_frame['soiltype'].iloc[[4999, 10]].tolist()
+
+def test_cache_is_rebuilt_when_run_file_changes(tmp_path):
+    run_fname = str(tmp_path / 'run_file.csv')
+    make_run_file(run_fname, 100)
+    assert len(RunFileCache(run_fname).records) == 100
+
+    make_run_file(run_fname, 150)
+    assert len(RunFileCache(run_fname).records) == 150